@@ -21,69 +21,1306 @@ You should have received a copy of the GNU General Public License
 along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
-import time, spidev, sys, smbus
+import os, time, sys, struct, array, threading, json, ctypes
+
+# numpy is optional and slow to import, so it is only imported when an
+# array path first needs it, see load_numpy
+numpy = None
+numpyLoaded = False
+
+def load_numpy():
+    """load_numpy, function to import numpy the first time it is needed.
+    Returns the module, or None if numpy is not installed"""
+
+    global numpy, numpyLoaded
+
+    if not numpyLoaded:
+        try:
+            import numpy as module
+        except ImportError:
+            module = None
+        numpy = module
+        numpyLoaded = True
+
+    return numpy
+
+def data_shift(powerMode='normal', resolution='low'):
+    """data_shift, function to return the right shift that removes the left
+    justification of the output data for a power mode and resolution;
+    8 bit low power mode, 10 bit normal mode or 12 bit high resolution"""
+
+    if powerMode == 'low':
+        return 8
+    elif resolution == 'high':
+        return 4
+
+    return 6
+
+def decode_samples(data, shift=6, dtype='int16'):
+    """decode_samples, function to convert a buffer of output register
+    bytes (OUT_X_L, OUT_X_H, OUT_Y_L, ... repeated) into x, y, z samples.
+    The little endian 2s complement values are right shifted by shift (see
+    data_shift) to remove the left justification.
+
+    dtype - int16 or float32
+    Returns a numpy array shaped (n, 3) if numpy is available, otherwise a
+    flat array('h') or array('f') of x, y, z triples"""
+
+    if isinstance(data, list):
+        data = bytearray(data)
+
+    if load_numpy() is not None:
+        samples = numpy.frombuffer(data, dtype='<i2').reshape(-1, 3) >> shift
+        if dtype == 'float32':
+            return samples.astype(numpy.float32)
+        return samples
+
+    samples = array.array('h')
+    samples.frombytes(bytes(data))
+
+    if sys.byteorder == 'big':
+        samples.byteswap()
+
+    if dtype == 'float32':
+        return array.array('f', [value >> shift for value in samples])
+
+    return array.array('h', [value >> shift for value in samples])
+
+def decode_samples_into(data, out, count, shift=6, factor=None):
+    """decode_samples_into, function to decode the first count values of a
+    buffer of output register bytes, as decode_samples, into the sequence
+    out without building a list; multiplied by factor if given"""
+
+    for i in range(count):
+        value = data[2*i] | (data[2*i+1]<<8)
+        if value & 0x8000:
+            value -= 0x10000
+        value = value >> shift
+        if factor is not None:
+            out[i] = value*factor
+        else:
+            out[i] = value
 
-class Accelerometer:
+    return
+
+def check_out(out, units, isArray):
+    """check_out, function to raise ValueError if out can't hold the
+    values read_xyz_into/read_fifo_into would decode into it; units with
+    an integer out (the unit factor would be truncated to 0)"""
+
+    if units is None:
+        return
+
+    if isArray:
+        if out.dtype.kind != 'f':
+            raise ValueError('units need a float out array, not: '+str(out.dtype))
+    elif isinstance(out, array.array) and out.typecode not in ('f', 'd'):
+        raise ValueError('units need a float out array, not typecode: '+str(out.typecode))
+
+    return
+
+def fifo_count(fifoStatus):
+    """fifo_count, function to return the number of unread samples shown
+    by a FIFO_SRC_REG (0x2F) value"""
+
+    if fifoStatus & 0b00100000:    # EMPTY bit
+        return 0
+    elif fifoStatus & 0b01000000:  # OVRN_FIFO bit, all 32 levels full
+        return 32
+
+    return fifoStatus & 0b00011111  # FSS bits
+
+def fifo_limit(odr, latency=0.002):
+    """fifo_limit, function to return the most samples the fifo should
+    hold when a drain starts, leaving room for the samples arriving at
+    odr (Hz) in latency (s), the time from the wake up to the end of the
+    drain"""
+
+    return 32 - (int(odr*latency) + 1)
+
+def watermark_samples(odr, wakeRate=25, latency=0.002):
+    """watermark_samples, function to return the samples per wake up for
+    about wakeRate fifo drains per second at odr (Hz), capped at
+    fifo_limit so the fifo doesn't overrun"""
+
+    samplesPerWake = int(round(float(odr)/wakeRate))
+
+    return max(1, min(samplesPerWake, fifo_limit(odr, latency)))
+
+# output data sensitivity (mg/digit) for each (scale, data shift) combination,
+# the data shift being 8 for low power mode, 6 for normal mode and 4 for
+# high resolution mode (see data_shift)
+sensitivityTable = {}
+
+for scaleIndex, scale in enumerate([2, 4, 8, 16]):
+    for shift, mgPerDigit in [(8, [16, 32, 64, 192]), (6, [4, 8, 16, 48]),
+                              (4, [1, 2, 4, 12])]:
+        sensitivityTable[(scale, shift)] = float(mgPerDigit[scaleIndex])
+
+# conversion factors from mg to the supported output units
+unitFactors = {'mg': 1.0, 'g': 0.001, 'm/s2': 0.00980665}
+
+def convert_samples(samples, factor):
+    """convert_samples, function to multiply a block of samples (as
+    returned by decode_samples) by factor, returning float32 values"""
+
+    if load_numpy() is not None:
+        return numpy.multiply(samples, factor, dtype=numpy.float32)
+
+    return array.array('f', [value*factor for value in samples])
+
+# blocks of writable control registers (start register, count) held in the
+# register shadow, the read only registers between them (STATUS_REG,
+# OUT_X_L...OUT_Z_H, FIFO_SRC_REG, INT1_SRC, INT2_SRC and CLICK_SRC) are
+# skipped as reading INT1_SRC/INT2_SRC/CLICK_SRC clears latched interrupts.
+# Reading REFERENCE (0x26) resets the high pass filter, so it is not in the
+# blocks; it is only read when the filter is in reference mode and its value
+# has to be kept (see read_register_image), otherwise just written
+shadowBlocks = [(0x1E, 8), (0x2E, 1), (0x30, 1), (0x32, 3), (0x36, 3), (0x3A, 6)]
+blockRegisters = [reg for start, count in shadowBlocks
+                  for reg in range(start, start+count)]
+shadowRegisters = blockRegisters + [0x26]
+
+# shared bus handles, {handle key: [handle, users]}, and one lock per
+# physical bus, {bus key: lock}. Accelerometers on the same i2c bus number
+# share one SMBus handle, and all transactions on a bus are serialised
+busHandles = {}
+busLocks = {}
+busPoolLock = threading.Lock()
+
+def get_bus_lock(busKey):
+    """get_bus_lock, function to return the lock shared by all devices on
+    a bus, ('spi', port) or ('i2c', bus number)"""
+
+    with busPoolLock:
+        lock = busLocks.get(busKey)
+        if lock is None:
+            lock = busLocks[busKey] = threading.RLock()
+
+    return lock
+
+def open_bus(handleKey, opener):
+    """open_bus, function to return the shared handle for handleKey,
+    opening it with opener() if no other device is using it"""
+
+    with busPoolLock:
+        entry = busHandles.get(handleKey)
+        if entry is None:
+            entry = busHandles[handleKey] = [opener(), 0]
+        entry[1] += 1
+
+    return entry[0]
+
+def close_bus(handleKey):
+    """close_bus, function to release a handle from open_bus, the handle is
+    closed when its last device releases it"""
+
+    with busPoolLock:
+        entry = busHandles.get(handleKey)
+        if entry is None:
+            return
+        entry[1] -= 1
+        if entry[1] > 0:
+            return
+        del busHandles[handleKey]
+
+    entry[0].close()
+
+    return
+
+def open_spi(port, cs):
+    """open_spi, function to open a spidev.SpiDev for open_bus. spidev is
+    only imported when it is needed"""
+
+    import spidev
+
+    spi = spidev.SpiDev()
+    spi.open(port, cs)
+    spi.max_speed_hz = 4000000
+
+    return spi
+
+def open_i2c(busNumber):
+    """open_i2c, function to open a smbus.SMBus for open_bus. smbus is only
+    imported when it is needed"""
+
+    import smbus
+
+    return smbus.SMBus(busNumber)
+
+# linux/spi/spidev.h, SPI_IOC_MESSAGE(1) is _IOW('k', 0, struct spi_ioc_transfer)
+SPI_IOC_MESSAGE_1 = 0x40206B00
+# linux/i2c-dev.h and linux/i2c.h
+I2C_RDWR = 0x0707
+I2C_M_RD = 0x0001
+
+class SpiIocTransfer(ctypes.Structure):
+    """SpiIocTransfer, struct spi_ioc_transfer of linux/spi/spidev.h"""
+
+    _fields_ = [('tx_buf', ctypes.c_uint64), ('rx_buf', ctypes.c_uint64),
+                ('len', ctypes.c_uint32), ('speed_hz', ctypes.c_uint32),
+                ('delay_usecs', ctypes.c_uint16), ('bits_per_word', ctypes.c_uint8),
+                ('cs_change', ctypes.c_uint8), ('tx_nbits', ctypes.c_uint8),
+                ('rx_nbits', ctypes.c_uint8), ('word_delay_usecs', ctypes.c_uint8),
+                ('pad', ctypes.c_uint8)]
+
+class I2cMsg(ctypes.Structure):
+    """I2cMsg, struct i2c_msg of linux/i2c.h"""
+
+    _fields_ = [('addr', ctypes.c_uint16), ('flags', ctypes.c_uint16),
+                ('len', ctypes.c_uint16), ('buf', ctypes.c_void_p)]
+
+class I2cRdwrIoctlData(ctypes.Structure):
+    """I2cRdwrIoctlData, struct i2c_rdwr_ioctl_data of linux/i2c-dev.h"""
+
+    _fields_ = [('msgs', ctypes.c_void_p), ('nmsgs', ctypes.c_uint32)]
+
+def buffer_address(buf):
+    """buffer_address, function to return the address of a bytearray's
+    data. The bytearray can't be resized while the address is in use"""
+
+    return ctypes.addressof((ctypes.c_char*len(buf)).from_buffer(buf))
+
+class ReadTransfer:
+    """ReadTransfer, preallocated buffers and ioctl argument for reading
+    count consecutive registers with one ioctl on a spidev (mode spi) or
+    i2c-dev (mode i2c, device at address) file descriptor, without
+    building any Python objects. run returns a memoryview of the values"""
+
+    def __init__(self, mode, count, address=0x19):
+
+        import fcntl
+
+        self.ioctl = fcntl.ioctl
+
+        if mode == 'spi':
+            # the command byte is clocked out first, the values follow it
+            self.tx = bytearray(count + 1)
+            self.rx = bytearray(count + 1)
+            self.data = memoryview(self.rx)[1:]
+            self.arg = SpiIocTransfer(tx_buf=buffer_address(self.tx),
+                                      rx_buf=buffer_address(self.rx), len=count + 1)
+            self.request = SPI_IOC_MESSAGE_1
+        else: # i2c, a write of the sub-address then a read with a repeated start
+            self.tx = bytearray(1)
+            self.rx = bytearray(count)
+            self.data = memoryview(self.rx)
+            self.msgs = (I2cMsg*2)(I2cMsg(address, 0, 1, buffer_address(self.tx)),
+                                   I2cMsg(address, I2C_M_RD, count, buffer_address(self.rx)))
+            self.arg = I2cRdwrIoctlData(ctypes.addressof(self.msgs), 2)
+            self.request = I2C_RDWR
+
+    def run(self, fd, command):
+        """run, function to make the transfer, command being the SPI
+        command byte or i2c sub-address"""
+
+        self.tx[0] = command
+        self.ioctl(fd, self.request, self.arg)
+
+        return self.data
+
+class SpiTransport:
+    """SpiTransport, register access over SPI with spidev.
+
+    A transport provides read(reg, count) returning a list of count
+    register values, write(reg, values), read_byte(reg), write_byte(reg,
+    value) and close(), plus the attributes mode, busKey (the physical bus
+    shared with other devices) and maxBlock (the most bytes in one read).
+    Any object providing these can be given to Accelerometer as transport.
+    read_into(reg, buf), filling a bytearray or memoryview with len(buf)
+    consecutive registers, is optional.
+
+    device - optional, already opened object with the spidev.SpiDev
+             interface to use instead of opening /dev/spidev<port>.<cs>"""
+
+    mode = 'spi'
+    maxBlock = 4095  # spidev's default 4096 byte buffer, less the address byte
+
+    def __init__(self, port=0, cs=0, device=None):
+
+        self.handleKey = None
+        self.busKey = ('spi', port)
+        self.lock = get_bus_lock(self.busKey)
+        self.transfers = {}  # read_into transfers, {count: ReadTransfer}
+
+        if device is not None:
+            self.spi = device
+        else:
+            self.spi = open_bus(('spi', port, cs), lambda: open_spi(port, cs))
+            self.handleKey = ('spi', port, cs)
+
+        # read_into uses the spidev file descriptor directly when there is one
+        try:
+            self.fd = self.spi.fileno()
+        except AttributeError:
+            self.fd = None
+
+    def read_byte(self, reg):
+        """read_byte, function to read a single register"""
+
+        with self.lock:
+            return self.spi.xfer2([0b11000000+reg, 0])[1]  # read, auto increment
+
+    def write_byte(self, reg, value):
+        """write_byte, function to write a single register"""
+
+        with self.lock:
+            self.spi.xfer2([0b01000000+reg, value])  # write, auto increment
+
+        return
+
+    def read(self, reg, count=1):
+        """read, function to read count consecutive registers in one
+        transfer"""
+
+        with self.lock:
+            return self.spi.xfer2([0b11000000+reg]+[0]*count)[1:]
+
+    def read_into(self, reg, buf):
+        """read_into, function to read len(buf) consecutive registers into
+        buf (a bytearray or memoryview) in one transfer. With a spidev
+        device the transfer is a SPI_IOC_MESSAGE ioctl on buffers
+        preallocated for each transfer size, so nothing is allocated once
+        each size has been used; otherwise read's values are copied in"""
+
+        count = len(buf)
+
+        with self.lock:
+            if self.fd is None:
+                buf[:] = bytes(self.spi.xfer2([0b11000000+reg]+[0]*count)[1:])
+                return
+
+            transfer = self.transfers.get(count)
+            if transfer is None:
+                transfer = self.transfers[count] = ReadTransfer('spi', count)
+
+            buf[:] = transfer.run(self.fd, 0b11000000+reg)  # read, auto increment
+
+        return
+
+    def write(self, reg, values):
+        """write, function to write consecutive registers in one transfer"""
+
+        with self.lock:
+            self.spi.xfer2([0b01000000+reg]+list(values))
+
+        return
+
+    def close(self):
+        """close, function to release the shared spidev handle"""
+
+        if self.handleKey is not None:
+            close_bus(self.handleKey)
+            self.handleKey = None
+
+        return
+
+class I2cTransport:
+    """I2cTransport, register access over i2c with smbus, see SpiTransport
+    for the transport functions.
+
+    device - optional, already opened object with the smbus.SMBus interface
+             to use instead of opening /dev/i2c-<busNumber>"""
+
+    mode = 'i2c'
+    maxBlock = 32  # smbus block reads are limited to 32 bytes
+
+    def __init__(self, address=0x19, busNumber=1, device=None):
+
+        self.handleKey = None
+        self.addr = address
+        self.busKey = ('i2c', busNumber)
+        self.lock = get_bus_lock(self.busKey)
+        self.transfers = {}  # read_into transfers, {count: ReadTransfer}
+        self.fd = None       # i2c-dev file descriptor used by read_into
+
+        if device is not None:
+            self.bus = device
+            self.devicePath = None
+            # smbus2 handles keep their file descriptor in fd
+            if isinstance(getattr(device, 'fd', None), int):
+                self.fd = device.fd
+        else:
+            self.bus = open_bus(('i2c', busNumber), lambda: open_i2c(busNumber))
+            self.handleKey = ('i2c', busNumber)
+            self.devicePath = '/dev/i2c-'+str(busNumber)
+
+    def read_byte(self, reg):
+        """read_byte, function to read a single register"""
+
+        with self.lock:
+            return self.bus.read_byte_data(self.addr, reg)
+
+    def write_byte(self, reg, value):
+        """write_byte, function to write a single register"""
+
+        with self.lock:
+            self.bus.write_byte_data(self.addr, reg, value)
+
+        return
+
+    def read(self, reg, count=1):
+        """read, function to read count (up to maxBlock) consecutive
+        registers in one transfer, the MSb of the sub-address enables auto
+        increment"""
+
+        with self.lock:
+            return self.bus.read_i2c_block_data(self.addr, 0b10000000+reg, count)
+
+    def read_into(self, reg, buf):
+        """read_into, function to read len(buf) (up to maxBlock) consecutive
+        registers into buf (a bytearray or memoryview) in one transfer. On
+        Linux the transfer is an I2C_RDWR ioctl on buffers preallocated for
+        each transfer size, so nothing is allocated once each size has been
+        used; otherwise read's values are copied in"""
+
+        count = len(buf)
+
+        with self.lock:
+            if self.fd is None and self.devicePath is not None:
+                try:
+                    self.fd = os.open(self.devicePath, os.O_RDWR)
+                except OSError:
+                    self.devicePath = None  # no i2c-dev, don't try again
+
+            if self.fd is None:
+                buf[:] = bytes(self.bus.read_i2c_block_data(self.addr, 0b10000000+reg, count))
+                return
+
+            transfer = self.transfers.get(count)
+            if transfer is None:
+                transfer = self.transfers[count] = ReadTransfer('i2c', count, self.addr)
+
+            buf[:] = transfer.run(self.fd, 0b10000000+reg)  # auto increment
+
+        return
+
+    def write(self, reg, values):
+        """write, function to write consecutive registers in one transfer"""
+
+        with self.lock:
+            self.bus.write_i2c_block_data(self.addr, 0b10000000+reg, list(values))
+
+        return
+
+    def close(self):
+        """close, function to release the shared smbus handle"""
+
+        if self.devicePath is not None and self.fd is not None:
+            os.close(self.fd)  # opened by read_into
+            self.fd = None
+
+        if self.handleKey is not None:
+            close_bus(self.handleKey)
+            self.handleKey = None
+
+        return
+
+class SampleBuffer:
+    """SampleBuffer, fixed size ring buffer of x, y, z samples shared
+    between an acquisition thread (writer) and a consumer (reader). All
+    storage is allocated up front. Views handed out by read_available and
+    wait stay valid until the next read_available or wait call"""
+
+    def __init__(self, size=4096):
+
+        self.size = size
+        self.head = 0       # total samples written
+        self.tail = 0       # total samples released by the reader
+        self.pending = 0    # samples handed out but not yet released
+        self.overflows = 0  # samples dropped because the reader fell behind
+        self.closed = False # the writer has stopped, see close
+        self.condition = threading.Condition()
+
+        if load_numpy() is not None:
+            self.data = numpy.zeros((size, 3), dtype=numpy.int16)
+            self.scratch = numpy.zeros((size, 3), dtype=numpy.int16)
+        else:
+            self.data = array.array('h', [0]*(size*3))
+            self.scratch = array.array('h', [0]*(size*3))
+
+    def _copy(self, dst, dstIndex, src, srcIndex, count):
+        """_copy, function to copy count samples between sample arrays"""
+
+        if numpy is not None:
+            dst[dstIndex:dstIndex+count] = src[srcIndex:srcIndex+count]
+        else:
+            dst[dstIndex*3:(dstIndex+count)*3] = src[srcIndex*3:(srcIndex+count)*3]
+
+    def _view(self, buf, index, count):
+        """_view, function to return a view of count samples of buf"""
+
+        if numpy is not None:
+            return buf[index:index+count]
+
+        return memoryview(buf)[index*3:(index+count)*3]
+
+    def available(self):
+        """available, function to return the number of unread samples"""
+
+        with self.condition:
+            return self.head - self.tail - self.pending
+
+    def write(self, samples):
+        """write, function to append samples to the buffer. samples is
+        either a numpy (n, 3) array or a flat sequence of x, y, z triples.
+        If the reader has fallen behind the oldest unread samples are
+        dropped and counted in overflows"""
+
+        if numpy is not None:
+            samples = numpy.asarray(samples, dtype=numpy.int16).reshape(-1, 3)
+            count = len(samples)
+        else:
+            if not isinstance(samples, array.array):
+                samples = array.array('h', samples)
+            count = len(samples)//3
+
+        if count > self.size:  # only the newest samples fit
+            self.overflows += count - self.size
+            if numpy is not None:
+                samples = samples[count-self.size:]
+            else:
+                samples = samples[(count-self.size)*3:]
+            count = self.size
+
+        with self.condition:
+            free = self.size - (self.head - self.tail)
+
+            if count > free:
+                # drop the oldest samples, including any handed out views
+                dropped = count - free
+                self.overflows += dropped
+                self.tail += dropped
+                self.pending = max(0, self.pending - dropped)
+
+            index = self.head % self.size
+            first = min(count, self.size - index)
+            self._copy(self.data, index, samples, 0, first)
+            if count > first:
+                self._copy(self.data, 0, samples, first, count - first)
+
+            self.head += count
+            self.condition.notify_all()
+
+        return
+
+    def close(self):
+        """close, function to mark the end of the writes, waking any reader
+        blocked in wait"""
+
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+        return
+
+    def read_available(self, maxSamples=None):
+        """read_available, function to return a view of the unread samples.
+        Only the samples up to the end of the ring are returned, call again
+        to get any that have wrapped around to the start"""
+
+        with self.condition:
+            self.tail += self.pending
+            self.pending = 0
+
+            count = self.head - self.tail
+            if maxSamples is not None:
+                count = min(count, maxSamples)
+
+            index = self.tail % self.size
+            count = min(count, self.size - index)
+            self.pending = count
+
+            return self._view(self.data, index, count)
+
+    def wait(self, count, timeout=None):
+        """wait, function to block until count samples are available and
+        return a view of them. Samples that wrap around the end of the ring
+        are copied into a preallocated scratch buffer. Returns None if the
+        timeout (s) expires first, or the buffer is closed with fewer than
+        count samples left"""
+
+        count = min(count, self.size)
+
+        with self.condition:
+            self.tail += self.pending
+            self.pending = 0
+
+            endTime = None
+            if timeout is not None:
+                endTime = time.time() + timeout
+
+            while self.head - self.tail < count:
+                if self.closed:
+                    return None
+                remaining = None
+                if endTime is not None:
+                    remaining = endTime - time.time()
+                    if remaining <= 0:
+                        return None
+                self.condition.wait(remaining)
+
+            index = self.tail % self.size
+            self.pending = count
+
+            if index + count <= self.size:
+                return self._view(self.data, index, count)
+
+            first = self.size - index
+            self._copy(self.scratch, 0, self.data, index, first)
+            self._copy(self.scratch, first, self.data, 0, count - first)
+
+            return self._view(self.scratch, 0, count)
+
+class SampleClock:
+    """SampleClock, model of the sensor's sample timing used to give every
+    sample of a batched read a timestamp (time.monotonic_ns). The sensor
+    oscillator isn't exactly the nominal ODR, so the actual sample period
+    is fitted to the drain times of the recent reads (least squares over
+    window reads), and the phase to the earliest possible sample times of
+    the newest reads (reads only ever come late). Samples lost to a fifo
+    overrun show up as a gap in the drain times and are counted in
+    lostSamples"""
+
+    def __init__(self, odr=50, window=128):
+
+        self.window = window
+        self.reset(odr)
+
+    def reset(self, odr=50):
+        """reset, function to restart the model at a nominal ODR (Hz)"""
+
+        self.odr = odr
+        self.period = 1e9/odr if odr > 0 else 0.0  # fitted sample period (ns)
+        self.origin = None      # drain time all others are relative to (ns)
+        self.phase = 0.0        # fitted time of sample 0 relative to origin (ns)
+        self.sampleCount = 0    # samples counted since the reset, incl. lost ones
+        self.lostSamples = 0
+        self.reads = []         # (sample count, drain time - origin) of recent reads
+        self.fitted = True
+
+        return
+
+    def add(self, count, drainTime, overrun=False, newest=None):
+        """add, function to add a read of count samples, the number the fifo
+        held at drainTime (ns). overrun tells the model samples may have
+        been lost before this read. newest (1 to count) is the sample that
+        was the newest at drainTime if the read found more, i.e. the fifo
+        level a watermark interrupt edge fired at. The model is only fitted
+        when it is next used, so adding reads is cheap"""
+
+        if count == 0 or self.period == 0:
+            return
+
+        if self.origin is None:
+            self.origin = drainTime
+
+        t = float(drainTime - self.origin)
+
+        if overrun and len(self.reads) > 0:
+            # whole sample periods between the expected newest sample and
+            # the drain are samples the fifo dropped
+            self.fit()
+            expected = self.phase + (self.sampleCount + count - 1)*self.period
+            gap = int((t - expected)/self.period)
+            if gap > 0:
+                self.sampleCount += gap
+                self.lostSamples += gap
+            # the gap can be out by a sample as the fifo keeps discarding
+            # while it is read, so the phase is fitted again from here on
+            self.reads = []
+
+        self.sampleCount += count
+        if newest is None:
+            newest = count
+        self.reads.append((self.sampleCount - count + newest, t))
+        if len(self.reads) > self.window:
+            self.reads.pop(0)
+        self.fitted = False
+
+        return
+
+    def fit(self):
+        """fit, function to fit the sample period and phase to the recent
+        reads"""
+
+        if self.fitted:
+            return
+
+        n = len(self.reads)
+
+        if n >= 8:
+            meanCount = sum([count for count, t in self.reads])/float(n)
+            meanTime = sum([t for count, t in self.reads])/float(n)
+            spread = sum([(count - meanCount)**2 for count, t in self.reads])
+
+            if spread > 0:
+                slope = sum([(count - meanCount)*(t - meanTime)
+                             for count, t in self.reads])/spread
+                # ignore fits far from the nominal ODR
+                if 0.9 < slope*self.odr/1e9 < 1.1:
+                    self.period = slope
+
+        # the newest sample was produced at or before each drain time
+        self.phase = min([t - (count - 1)*self.period for count, t in self.reads[-32:]])
+        self.fitted = True
+
+        return
+
+    def timestamps(self, count):
+        """timestamps, function to return the timestamps (ns) of the last
+        count samples added as an int64 array (numpy, or array('q') without
+        numpy)"""
+
+        self.fit()
+
+        first = self.phase + (self.sampleCount - count)*self.period
+
+        if self.origin is not None:
+            first += self.origin
+
+        if load_numpy() is not None:
+            return (first + numpy.arange(count)*self.period).astype(numpy.int64)
+
+        return array.array('q', [int(first + i*self.period) for i in range(count)])
+
+    def stamp(self, count, drainTime=None, overrun=False):
+        """stamp, function to add a read of count samples drained at
+        drainTime (ns, default now) and return their timestamps, see add
+        and timestamps"""
+
+        if drainTime is None:
+            drainTime = time.monotonic_ns()
+
+        self.add(count, drainTime, overrun)
+
+        return self.timestamps(count)
+
+    def rate(self):
+        """rate, function to return the estimated actual sample rate (Hz)"""
+
+        self.fit()
+
+        if self.period == 0:
+            return 0.0
+
+        return 1e9/self.period
+
+    def drift(self):
+        """drift, function to return the estimated sample rate error from
+        the nominal ODR in parts per million"""
+
+        if self.odr == 0:
+            return 0.0
+
+        return (self.rate()/self.odr - 1.0)*1e6
+
+class DrainScheduler:
+    """DrainScheduler, works out how long to sleep between polled fifo
+    reads. The sleep aims for target samples in the fifo at each read from
+    the observed arrival rate (fill/elapsed time), less the usual oversleep,
+    backs off when reads find the fifo empty and halves after an overrun.
+    It never sleeps longer than it takes to fill limit samples, and the
+    target is kept to 3/4 of limit to leave a margin for sleep jitter and
+    the time the drain takes"""
+
+    def __init__(self, odr=50, target=16, limit=28):
+
+        self.reset(odr, target, limit)
+
+    def reset(self, odr=50, target=16, limit=28):
+        """reset, function to restart the schedule for an ODR (Hz), target
+        fill and fill limit (samples)"""
+
+        self.odr = odr
+        self.target = max(1, min(target, limit*3//4))
+        self.maxDelay = float(limit)/odr
+        self.minDelay = min(0.0005, self.maxDelay)
+        self.rate = float(odr)     # estimated sample arrival rate (Hz)
+        self.oversleep = 0.0       # estimated sleep overrun (s)
+        self.delay = float(target)/odr
+        self.lastTime = None
+
+        return
+
+    def update(self, fill, overrun=False, now=None):
+        """update, function to add a read that found fill samples at time
+        now (time.monotonic, default now) and return the next sleep (s)"""
+
+        if now is None:
+            now = time.monotonic()
+
+        if self.lastTime is not None:
+            elapsed = now - self.lastTime
+            self.oversleep += 0.2*(max(0.0, elapsed - self.delay) - self.oversleep)
+
+            if overrun:
+                self.delay = self.delay/2.0
+            elif fill == 0:
+                self.delay = self.delay*2.0
+            else:
+                if elapsed > 0:
+                    self.rate += 0.2*(fill/elapsed - self.rate)
+                self.delay = float(self.target)/self.rate - self.oversleep
+
+        self.delay = max(self.minDelay, min(self.maxDelay, self.delay))
+        self.lastTime = now
+
+        return self.delay
+
+class SampleStream:
+    """SampleStream, iterator of blocks of samples collected by an
+    Accelerometer's acquisition thread, see Accelerometer.stream. rate is
+    the sample rate (Hz) of the blocks. Stages of a processing pipeline
+    (see LIS3DHDsp) can be chained on with |"""
+
+    def __init__(self, accel, blockSize=32, units=None, timeout=None):
+
+        self.accel = accel
+        self.blockSize = blockSize
+        self.units = units
+        self.timeout = timeout
+        self.rate = accel.odr
+        self.started = False  # the acquisition thread was started by the stream
+
+    def __iter__(self):
+
+        return self
+
+    def __next__(self):
+
+        accel = self.accel
+
+        if accel.streamThread is None:
+            if accel.shadow_read(0x24) & 0b01000000:  # FIFO_EN bit
+                accel.start_stream('fifo')
+            else:
+                accel.start_stream('poll')
+            self.started = True
+
+        # raises the error if the acquisition thread failed
+        block = accel.wait(self.blockSize, self.timeout)
+
+        if block is None:
+            raise StopIteration
+
+        if self.units is not None:
+            return accel.convert_units(block, self.units)
+
+        return block
+
+    def __or__(self, stage):
+
+        return stage.apply(self)
+
+    def close(self):
+        """close, function to stop the acquisition thread if the stream
+        started it"""
+
+        if self.started:
+            self.accel.stop_stream()
+            self.started = False
+
+        return
+
+class Profile:
+    """Profile, description of a complete accelerometer set up that can be
+    written to the accelerometer in a few burst writes with
+    Accelerometer.apply, and saved to or loaded from json.
+
+    settings are given as keyword arguments named after the Accelerometer
+    set up function to call, with the function arguments as a dict (keyword
+    arguments), a list (positional arguments) or a single value, i.e.
+
+    Profile(set_ODR={'odr': 400}, set_scale=4, set_int1_threshold=256)
+
+    registers is an optional {register: value} register image (as returned
+    by Accelerometer.snapshot) the settings are applied on top of"""
+
+    # set up functions in the order they are applied, the scale and ODR are
+    # set before the thresholds and durations that depend on them
+    settingNames = ['set_ODR', 'axis_enable', 'set_scale', 'set_resolution',
+                    'set_BDU', 'set_highpass_filter', 'interrupt_high_low',
+                    'latch_interrupt', 'set_4D', 'set_int1_pin',
+                    'set_int1_config', 'set_int1_threshold', 'set_int1_duration',
+                    'set_click_config', 'set_click_threshold',
+                    'set_click_timelimit', 'set_click_timelatency',
+                    'set_click_timewindow', 'set_fifo_mode', 'set_fifo_threshold',
+                    'set_adcOn', 'enable_temperature', 'disable_temperature']
+
+    def __init__(self, registers=None, **settings):
+
+        for name in settings:
+            if name not in self.settingNames:
+                raise ValueError('Unknown profile setting: '+str(name))
+
+        self.settings = settings
+        self.registers = {}
+
+        if registers is not None:
+            for reg in registers:
+                self.registers[int(reg)] = registers[reg]
+
+    def to_dict(self):
+        """to_dict, function to return the profile as a json serialisable
+        dict"""
+
+        registers = {}
+        for reg in self.registers:
+            registers[hex(reg)] = self.registers[reg]
+
+        return {'settings': self.settings, 'registers': registers}
+
+    def to_json(self):
+        """to_json, function to return the profile as a json string"""
 
-    def __init__(self, mode, i2cAddress = 0x0, spiPort = 0, spiCS = 0):
+        return json.dumps(self.to_dict(), sort_keys=True)
 
-        self.mode = mode
+    @classmethod
+    def from_dict(cls, profileDict):
+        """from_dict, function to create a profile from a dict made by
+        to_dict"""
+
+        registers = {}
+        for reg, value in profileDict.get('registers', {}).items():
+            registers[int(reg, 0)] = value
+
+        return cls(registers=registers, **profileDict.get('settings', {}))
+
+    @classmethod
+    def from_json(cls, text):
+        """from_json, function to create a profile from a json string made
+        by to_json"""
+
+        return cls.from_dict(json.loads(text))
+
+class BusStats:
+    """BusStats, bus transaction statistics collected by
+    Accelerometer.enable_stats; transaction and byte counts per register,
+    a fixed bucket histogram of transaction latency, errors and retries
+    (transactions to a register straight after one to it failed)"""
+
+    # upper bounds (s) of the latency histogram buckets, the last bucket
+    # counts everything slower
+    latencyBuckets = [10e-6, 20e-6, 50e-6, 100e-6, 200e-6, 500e-6,
+                      1e-3, 2e-3, 5e-3, 10e-3]
+
+    def __init__(self):
+
+        self.reset()
+
+    def reset(self):
+        """reset, function to clear all of the statistics"""
+
+        self.transactions = 0
+        self.bytes = 0
+        self.errors = 0
+        self.retries = 0
+        self.registers = {}  # register: [reads, writes, bytes]
+        self.histogram = [0]*(len(self.latencyBuckets)+1)
+        self.latencyTotal = 0.0
+        self.latencyMax = 0.0
+        self.failedRegister = None
+
+        return
+
+    def record(self, reg, write, count, latency):
+        """record, function to record a completed transaction of count
+        bytes"""
+
+        self.transactions += 1
+        self.bytes += count
+
+        if self.failedRegister is not None:
+            if self.failedRegister == reg:
+                self.retries += 1
+            self.failedRegister = None
+
+        regStats = self.registers.get(reg)
+        if regStats is None:
+            regStats = self.registers[reg] = [0, 0, 0]
+
+        regStats[1 if write else 0] += 1
+        regStats[2] += count
+
+        bucket = 0
+        for bound in self.latencyBuckets:
+            if latency <= bound:
+                break
+            bucket += 1
+
+        self.histogram[bucket] += 1
+        self.latencyTotal += latency
+        if latency > self.latencyMax:
+            self.latencyMax = latency
+
+        return
+
+    def record_error(self, reg):
+        """record_error, function to record a failed transaction"""
+
+        if self.failedRegister == reg:
+            self.retries += 1
+
+        self.errors += 1
+        self.failedRegister = reg
+
+        return
+
+    def wrap(self, function, write, multiple):
+        """wrap, function to return an instrumented version of one of the
+        Accelerometer bus access functions"""
+
+        clock = time.perf_counter
+
+        def instrumented(reg=0x00, *args, **kwargs):
+            startTime = clock()
+            try:
+                result = function(reg, *args, **kwargs)
+            except Exception:
+                self.record_error(reg)
+                raise
+
+            if not multiple:
+                count = 1
+            elif write:
+                count = len(args[0] if args else kwargs['regValues'])
+            else:
+                count = len(result)
+
+            self.record(reg, write, count, clock() - startTime)
+
+            return result
+
+        return instrumented
+
+    def to_dict(self):
+        """to_dict, function to return the statistics as a dict"""
+
+        registers = {}
+        for reg in sorted(self.registers):
+            regStats = self.registers[reg]
+            registers[hex(reg)] = {'reads': regStats[0], 'writes': regStats[1],
+                                   'bytes': regStats[2]}
+
+        averageLatency = 0.0
+        if self.transactions > 0:
+            averageLatency = self.latencyTotal/self.transactions
+
+        return {'transactions': self.transactions, 'bytes': self.bytes,
+                'errors': self.errors, 'retries': self.retries,
+                'registers': registers,
+                'latencyBuckets': list(self.latencyBuckets),
+                'latencyHistogram': list(self.histogram),
+                'latencyAverage': averageLatency, 'latencyMax': self.latencyMax}
+
+class Accelerometer:
+
+    def __init__(self, mode='spi', i2cAddress = 0x19, spiPort = 0, spiCS = 0, shadow=False,
+                 device=None, i2cBus=1, transport=None):
+        """mode - spi or i2c
+        i2cAddress - i2c address, 0x19 (SDO high) or 0x18 (SDO low)
+        i2cBus - i2c bus number, /dev/i2c-<i2cBus>
+        device - optional, already opened object with the spidev.SpiDev
+                 (spi) or smbus.SMBus (i2c) interface to use instead of the
+                 hardware, i.e. LIS3DHEmulator.EmulatedSpiDev
+        transport - optional transport object to use for all register
+                    access instead of mode, see SpiTransport
+
+        Accelerometers on the same i2c bus number (or SPI port and chip
+        select) share one bus handle, see open_bus"""
+
+        self.transport = None
         self.scale = 2
         self.odr = 50
+        self.powerMode = 'normal'
+        self.resolution = 'low'
+        self.dataShift = 6
+        self.sensitivity = sensitivityTable[(2, 6)]
         self.temperatureOffset = 0        
-
-        if self.mode == 'spi':
-            self.spi=spidev.SpiDev()
-            self.spi.open(spiPort,spiCS)
-            self.spi.max_speed_hz = 4000000
-        else:  #i2C
-            self.bus = smbus.SMBus(1)
-            self.addr = i2cAddress
+        self.streamBuffer = None
+        self.streamThread = None
+        self.streamStop = threading.Event()
+        self.streamError = None
+        self.streamEdgeTime = None
+        self.sampleClock = SampleClock(self.odr)
+        self.streamScheduler = None
+        self.lastFifoCount = 0      # samples read by the last read_fifo
+        self.lastDrainTime = None   # time.monotonic_ns of the last fifo read
+        self.lastDataTime = None    # time.monotonic of the last poll_xyz sample
+        self.dataLoss = {'fifoOverruns': 0, 'dataOverruns': 0, 'lostSamples': 0}
+        self.busStats = None
+
+        # preallocated read_xyz_into/read_fifo_into transfer buffers, the
+        # views of them are made as they are first needed and then reused
+        self.statusBuffer = bytearray(1)
+        self.xyzBuffer = bytearray(6)
+        self.fifoBuffer = bytearray(32*6)
+        self.fifoViews = [[None]*33 for i in range(33)]  # [first][count] sample views
+        self.intoOut = None    # last read_fifo_into out array, and its row views
+        self.intoRows = None
+        self.xyzOut = None     # last read_xyz_into out array, and its x, y, z view
+        self.xyzOutView = None
+        self.xyzRaw = None     # numpy views of the buffers, see into_arrays
+
+        if transport is None:
+            if mode == 'spi':
+                transport = SpiTransport(spiPort, spiCS, device)
+            else:  #i2C
+                transport = I2cTransport(i2cAddress, i2cBus, device)
+
+        self.transport = transport
+        self.mode = transport.mode
+        self.busKey = transport.busKey
+        self.transportReadInto = hasattr(transport, 'read_into')  # optional
+
+        self.shadow = None
+        self.staging = None  # register image used by apply
+
+        if shadow == True:
+            self.resync()
 
     def single_access_read(self, reg=0x00):
         """single_access_read, function to read a single data register
         of the LIS3DH"""
 
-        rwBit = 0b1  # read/write bit set to read
-        msBit = 0b1  # multiple read/write address increment select bit set to auto increment
-
-        if self.mode == 'spi':
-            dataTransfer=self.spi.xfer2([(rwBit<<7)+(msBit<<6)+reg,0])
-
-            # for testing
-            #print(hex(reg), hex(dataTransfer[1]),bin(dataTransfer[1]))
-            
-            return dataTransfer[1]
-        
-        else: #i2c
-            dataTransfer=self.bus.read_byte_data(self.addr,reg)
-            return dataTransfer
-       
+        return self.transport.read_byte(reg)
 
     def single_access_write(self, reg=0x00, regValue=0x0):
         """single_access_write, function to write a single data register
         of the LIS3DH"""
 
-        rwBit = 0b0  # read/write bit set to write
-        msBit = 0b1  # multiple read/write address increment select bit set to auto increment
+        self.transport.write_byte(reg, regValue)
+
+        return
+
+    def multiple_access_read(self, reg=0x00, count=1):
+        """multiple_access_read, function to read count consecutive data
+        registers of the LIS3DH, starting at reg, in a single bus
+        transaction (count is limited to transport.maxBlock). Returns a list
+        of byte values"""
+
+        return self.transport.read(reg, count)
+
+    def multiple_access_read_into(self, reg=0x00, buf=None):
+        """multiple_access_read_into, function to read len(buf) consecutive
+        data registers of the LIS3DH, starting at reg, into buf (a bytearray
+        or memoryview) in a single bus transaction, see
+        SpiTransport.read_into. Returns buf"""
+
+        if self.transportReadInto:
+            self.transport.read_into(reg, buf)
+        else:
+            buf[:] = bytes(self.transport.read(reg, len(buf)))
 
-        if self.mode == 'spi':
-            dataTransfer=self.spi.xfer2([(rwBit<<7)+(msBit<<6)+reg,regValue])
-            # for testing
-            #print(bin((rwBit<<7)+(msBit<<6)+reg),hex(reg), hex(regValue), hex(dataTransfer[1]))
-            
-        else: #i2c
-            self.bus.write_byte_data(self.addr, reg, regValue)    
+        return buf
+
+    def multiple_access_write(self, reg=0x00, regValues=()):
+        """multiple_access_write, function to write consecutive data
+        registers of the LIS3DH, starting at reg, in a single bus
+        transaction"""
+
+        self.transport.write(reg, regValues)
+
+        return
+
+    def shadow_read(self, reg=0x00):
+        """shadow_read, function to read a control register. If the register
+        shadow is enabled (shadow=True) the value comes from the shadow
+        instead of the bus"""
+
+        if self.staging is not None and reg in self.staging:
+            return self.staging[reg]
+
+        if self.shadow is None or reg not in shadowRegisters:
+            return self.single_access_read(reg)
+
+        if reg not in self.shadow:
+            self.shadow[reg] = self.single_access_read(reg)
+
+        return self.shadow[reg]
+
+    def shadow_write(self, reg=0x00, regValue=0x0):
+        """shadow_write, function to write a control register. If the
+        register shadow is enabled the write is skipped when the register
+        already holds regValue"""
+
+        if self.staging is not None and reg in self.staging:
+            self.staging[reg] = regValue
+            return
+
+        if self.shadow is not None and reg in shadowRegisters:
+            if self.shadow.get(reg) == regValue:
+                return
+            self.shadow[reg] = regValue
+
+        self.single_access_write(reg, regValue)
 
         return
 
-    def twos_complement_conversion(self, msb, lsb):
-        """twos_complement_conversion, function to change the 10 bit value
+    def invalidate(self):
+        """invalidate, function to empty the register shadow, i.e. after the
+        accelerometer has been reset or written to by something else.
+        Registers are read back from the bus the next time they are used"""
+
+        if self.shadow is not None:
+            self.shadow = {}
+
+        return
+
+    def reset_data_loss(self):
+        """reset_data_loss, function to clear the data loss counters"""
+
+        for name in self.dataLoss:
+            self.dataLoss[name] = 0
+
+        return
+
+    def reset_stats(self):
+        """reset_stats, function to clear the bus statistics"""
+
+        if self.busStats is not None:
+            self.busStats.reset()
+
+        return
+
+    def resync(self):
+        """resync, function to enable the register shadow (if not already)
+        and fill it from the accelerometer with one burst read per block of
+        writable control registers (0x1E-0x3F). The scale, ODR, power mode
+        and resolution tracked by the module are updated from it"""
+
+        self.shadow = self.read_register_image()
+        self.load_register_settings(self.shadow)
+
+        return
+
+    def read_register_image(self):
+        """read_register_image, function to burst read the writable control
+        registers (see shadowBlocks) into a {register: value} dict.
+        REFERENCE (0x26) is only included when CTRL_REG2 has the high pass
+        filter in reference mode, reading it resets the filter"""
+
+        image = {}
+
+        for start, count in shadowBlocks:
+            values = self.multiple_access_read(start, count)
+            for i in range(count):
+                image[start+i] = values[i]
+
+        if image[0x21]>>6 == 0b01:  # HPM bits, reference mode
+            image[0x26] = self.single_access_read(0x26)
+
+        return image
+
+    def twos_complement_conversion(self, msb, lsb, shift=6):
+        """twos_complement_conversion, function to change the value
         split across 2 bytes from 2s complement to normal binary/decimal. Also
-        the left justification of the 10 bits is removed.
+        the left justification of the value is removed.
 
         msb = most significant byte
-        lsb = least significant byte"""
+        lsb = least significant byte
+        shift = 6 for 10 bit values, see data_shift for the others"""
 
         signBit= (msb & 0b10000000)>>7
         msb = msb & 0x7F  # strip off sign bit
@@ -96,7 +1333,7 @@ class Accelerometer:
         else: # positive number        
             x = (msb<<8) + lsb
 
-        x = x>>6  # remove left justification of data    
+        x = x>>shift  # remove left justification of data    
 
         return x
 
@@ -115,6 +1352,72 @@ class Accelerometer:
         
         return adcTotal
 
+    def apply(self, profile):
+        """apply, function to put the accelerometer into the state described
+        by a Profile. The profile's register image and set up functions are
+        worked out against an in memory copy of the control registers, then
+        only the changed registers are written, one burst write per block
+        of consecutive registers (i.e. CTRL_REG1-CTRL_REG6, 0x20-0x25)"""
+
+        if self.shadow is not None:
+            current = dict(self.shadow)
+            for reg in blockRegisters:
+                if reg not in current:
+                    current = self.read_register_image()
+                    break
+        else:
+            current = self.read_register_image()
+
+        self.staging = dict(current)
+
+        try:
+            for reg in profile.registers:
+                if reg in self.staging or reg == 0x26:
+                    self.staging[reg] = profile.registers[reg]
+
+            self.load_register_settings(self.staging)
+
+            for name in Profile.settingNames:
+                if name not in profile.settings:
+                    continue
+
+                args = profile.settings[name]
+                function = getattr(self, name)
+
+                if args is None:
+                    function()
+                elif isinstance(args, dict):
+                    function(**args)
+                elif isinstance(args, (list, tuple)):
+                    function(*args)
+                else:
+                    function(args)
+
+            image = self.staging
+
+        finally:
+            self.staging = None
+
+        for start, count in shadowBlocks:
+            changed = [reg for reg in range(start, start+count)
+                       if image[reg] != current[reg]]
+
+            if len(changed) == 1:
+                self.single_access_write(changed[0], image[changed[0]])
+            elif len(changed) > 1:
+                self.multiple_access_write(changed[0],
+                                           [image[reg] for reg in range(changed[0], changed[-1]+1)])
+
+        # REFERENCE is written whenever its value is known and not
+        # already in the accelerometer, it is never read back here
+        if 0x26 in image and image[0x26] != current.get(0x26):
+            self.single_access_write(0x26, image[0x26])
+
+        if self.shadow is not None:
+            self.shadow = image
+
+        return
+
     def axis_enable(self, x='on',y='on',z='on'):
         """axis_enable, function to enable/disable the x, y and z axis"""
 
@@ -122,7 +1425,7 @@ class Accelerometer:
         yBit = 0b1   # default value - 'on'
         zBit = 0b1   # default value - 'on'
 
-        CTRL_REG1 = self.single_access_read(0x20)
+        CTRL_REG1 = self.shadow_read(0x20)
 
         if x == 'off':
             xBit = 0b0
@@ -138,15 +1441,22 @@ class Accelerometer:
 
         #print (bin(CTRL_REG1)) # for testing
 
-        self.single_access_write(0x20, CTRL_REG1)
+        self.shadow_write(0x20, CTRL_REG1)
 
         return 
 
+    def convert_units(self, samples, units='g'):
+        """convert_units, function to convert a block of raw samples (as
+        returned by read_fifo) to mg, g or m/s2 using the current scale,
+        power mode and resolution"""
+
+        return convert_samples(samples, self.unit_factor(units))
+
     def disable_temperature(self, adcOn='on'):
         """disable_temperature, function to disable the on board temperature
         sensor. This sets bit 6 and optionally bit 7 of TEMP_CFG_REG (0x1F)"""       
 
-        TEMP_CFG_REG = self.single_access_read(0x1F)
+        TEMP_CFG_REG = self.shadow_read(0x1F)
 
         adcBit = 0b1  # default value
 
@@ -158,7 +1468,40 @@ class Accelerometer:
 
         #print (bin(TEMP_CFG_REG)) # for testing
 
-        self.single_access_write(0x1F, TEMP_CFG_REG)
+        self.shadow_write(0x1F, TEMP_CFG_REG)
+
+        return
+
+    def disable_stats(self):
+        """disable_stats, function to turn off the bus statistics and
+        remove the instrumentation from the bus access functions"""
+
+        for name in ('single_access_read', 'single_access_write',
+                     'multiple_access_read', 'multiple_access_read_into',
+                     'multiple_access_write'):
+            self.__dict__.pop(name, None)
+
+        self.busStats = None
+
+        return
+
+    def enable_stats(self):
+        """enable_stats, function to start collecting bus statistics, see
+        stats. The bus access functions are only instrumented while the
+        statistics are enabled, so there is no cost when they are off"""
+
+        if self.busStats is not None:
+            return
+
+        self.busStats = BusStats()
+
+        for name, write, multiple in (('single_access_read', False, False),
+                                      ('single_access_write', True, False),
+                                      ('multiple_access_read', False, True),
+                                      ('multiple_access_read_into', False, True),
+                                      ('multiple_access_write', True, True)):
+            function = getattr(self, name)
+            setattr(self, name, self.busStats.wrap(function, write, multiple))
 
         return
 
@@ -166,15 +1509,90 @@ class Accelerometer:
         """enable_temperature, function to enable the on board temperature
         sensor. This sets bits 6&7 of TEMP_CFG_REG (0x1F)"""
 
-        self.single_access_write(0x1F, 0xC0) # enable adc's and enable temp sensor
+        self.shadow_write(0x1F, 0xC0) # enable adc's and enable temp sensor
+
+        return
+
+    def count_fifo_read(self, count, drainTime, fifoStatus, edge=None):
+        """count_fifo_read, function to add a fifo read of count samples
+        drained at drainTime (ns) to sampleClock and, if FIFO_SRC_REG showed
+        an overrun, to the data loss counters. edge is (time (ns), fifo
+        level) of the interrupt edge that started the read, see read_fifo"""
+
+        overrun = (fifoStatus & 0b01000000) != 0  # OVRN_FIFO bit
+        lostSamples = self.sampleClock.lostSamples
+
+        # the kernel timestamp of the watermark edge marks when the fifo
+        # reached the watermark level, closer to the sample times than the
+        # drain. It is only used for an edge since the last read, when the
+        # fifo has at least that many samples and none were lost
+        clockTime = drainTime
+        newest = None
+        if edge is not None and not overrun and self.lastDrainTime is not None:
+            edgeTime, level = edge
+            if self.lastDrainTime < edgeTime <= drainTime and 0 < level <= count:
+                clockTime = edgeTime
+                newest = level
+
+        # every read goes into the clock model so timestamps stay in step
+        self.sampleClock.add(count, clockTime, overrun, newest)
+        self.lastFifoCount = count
+        self.lastDrainTime = drainTime
+
+        if overrun:
+            self.dataLoss['fifoOverruns'] += 1
+            self.dataLoss['lostSamples'] += self.sampleClock.lostSamples - lostSamples
 
         return
 
+    def into_arrays(self):
+        """into_arrays, function to make the numpy views of the
+        read_xyz_into/read_fifo_into buffers, the first time a numpy out
+        array is used"""
+
+        self.xyzRaw = numpy.frombuffer(self.xyzBuffer, dtype='<i2')
+        fifoRaw = numpy.frombuffer(self.fifoBuffer, dtype='<i2').reshape(32, 3)
+        self.fifoRaw = [fifoRaw[:count] for count in range(33)]
+        # numpy only avoids allocating for 0-d array operands, not
+        # Python numbers, so the shifts and unit factors are kept as 0-d
+        # arrays (factors per out dtype, {dtype: array})
+        self.shiftScalars = {}
+        for shift in (4, 6, 8):
+            self.shiftScalars[shift] = numpy.array(shift, dtype=numpy.int16)
+        self.factorScalars = {}
+
+        return
+
+    def decode_array_into(self, raw, out, factor=None):
+        """decode_array_into, function to decode a numpy view of the raw
+        output register values into the numpy array out, of the same shape.
+        raw is shifted in place, and out multiplied by factor if given"""
+
+        numpy.right_shift(raw, self.shiftScalars[self.dataShift], raw)
+        numpy.copyto(out, raw)
+
+        if factor is not None:
+            factorScalar = self.factorScalars.get(out.dtype)
+            if factorScalar is None:
+                factorScalar = self.factorScalars[out.dtype] = numpy.zeros((), dtype=out.dtype)
+            factorScalar.fill(factor)
+            numpy.multiply(out, factorScalar, out)
+
+        return
+
+    def data_loss(self):
+        """data_loss, function to return the data loss counters as a dict;
+        fifoOverruns (reads finding the OVRN_FIFO bit of FIFO_SRC_REG set),
+        dataOverruns (poll_xyz samples with the ZYXOR bit of STATUS_REG set)
+        and lostSamples, the estimated number of samples lost by both"""
+
+        return dict(self.dataLoss)
+
     def interrupt_high_low(self, level='high'):
         """interrupt_high_low, function to set the interrupt pins to either
         active high or active low"""
 
-        CTRL_REG6 = self.single_access_read(0x25)
+        CTRL_REG6 = self.shadow_read(0x25)
 
         if level == 'low':
             highlowBit = 0b1
@@ -186,7 +1604,7 @@ class Accelerometer:
 
         #print (bin(CTRL_REG6)) # for testing
 
-        self.single_access_write(0x25, CTRL_REG6)
+        self.shadow_write(0x25, CTRL_REG6)
 
         return
 
@@ -262,7 +1680,7 @@ class Accelerometer:
         """latch_interrupt, function to turn the latch feature on interrupt1
         on or off"""
 
-        CTRL_REG5 = self.single_access_read(0x24)
+        CTRL_REG5 = self.shadow_read(0x24)
 
         if latch == 'off':
             latchBit = 0b0
@@ -274,15 +1692,260 @@ class Accelerometer:
 
         #print (bin(CTRL_REG5)) # for testing
 
-        self.single_access_write(0x24, CTRL_REG5)
+        self.shadow_write(0x24, CTRL_REG5)
+
+        return
+
+    def load_register_settings(self, image):
+        """load_register_settings, function to update the scale, ODR, power
+        mode and resolution tracked by the module from a {register: value}
+        register image. The sample clock is restarted if the ODR or power
+        mode changes"""
+
+        previous = (self.odr, self.powerMode)
+
+        self.scale = [2, 4, 8, 16][(image[0x23] & 0b00110000)>>4]
+
+        odrBits = image[0x20]>>4
+        lowPowerBit = (image[0x20] & 0b00001000)>>3
+
+        odrOptions = [(1,0b0001),(10,0b0010),(25,0b0011),(50,0b0100),
+                      (100,0b0101),(200,0b0110),(400,0b0111),(1600,0b1000),
+                      (1250,0b1001)]
+
+        if odrBits == 0b0000:
+            self.powerMode = 'off'
+        elif lowPowerBit == 1:
+            self.powerMode = 'low'
+        else:
+            self.powerMode = 'normal'
+
+        if image[0x23] & 0b00001000:  # HR bit
+            self.resolution = 'high'
+        else:
+            self.resolution = 'low'
+
+        self.update_data_format()
+
+        if odrBits == 0b1001 and lowPowerBit == 1:
+            self.odr = 5000
+        else:
+            for dataRate in odrOptions:
+                if dataRate[1] == odrBits:
+                    self.odr = dataRate[0]
+
+        if (self.odr, self.powerMode) != previous:
+            self.sampleClock.reset(self.odr)
+
+        return
+
+    def poll_xyz(self, units=None):
+        """poll_xyz, function to check the ZYXDA bit of STATUS_REG (0x27)
+        and read_xyz if there is a new sample, otherwise return None. A set
+        ZYXOR bit means samples were overwritten before they were read,
+        these are counted in data_loss, estimating the number lost from the
+        time since the last sample"""
+
+        status = self.single_access_read(0x27)
+        now = time.monotonic()
+
+        if not status & 0b00001000:  # ZYXDA bit
+            return None
+
+        if status & 0b10000000:      # ZYXOR bit
+            lostSamples = 1
+            if self.lastDataTime is not None:
+                lostSamples = max(1, int(round((now - self.lastDataTime)*self.odr)) - 1)
+            self.dataLoss['dataOverruns'] += 1
+            self.dataLoss['lostSamples'] += lostSamples
+
+        self.lastDataTime = now
+
+        return self.read_xyz(units)
+
+    def read_available(self, maxSamples=None):
+        """read_available, function to return a view of the samples
+        collected by the acquisition thread since the last read, see
+        start_stream and SampleBuffer.read_available. Once the samples
+        left by an acquisition thread that stopped on an error have been
+        read, the error is raised"""
+
+        samples = self.streamBuffer.read_available(maxSamples)
+
+        if len(samples) == 0 and self.streamError is not None:
+            raise self.streamError
+
+        return samples
+
+    def read_fifo(self, units=None, timestamps=False, edge=None):
+        """read_fifo, function to read out all of the samples currently
+        stored in the fifo. The number of unread samples is taken from
+        FIFO_SRC_REG (0x2F), then the output registers (0x28-0x2D) are burst
+        read; while the fifo is enabled the address rolls back to 0x28 after
+        0x2D so each burst returns consecutive samples. Returns the samples
+        as decoded by decode_samples, or as float32 values if units (mg, g
+        or m/s2) is given. With timestamps returns (samples, timestamps),
+        the time.monotonic_ns of each sample as an int64 array worked out
+        by sampleClock (see SampleClock). edge is (kernel timestamp (ns),
+        fifo level) of the watermark interrupt edge that started the read,
+        given to sampleClock in place of the host read time"""
+
+        fifoStatus = self.single_access_read(0x2F)
+        drainTime = time.monotonic_ns()
+        count = fifo_count(fifoStatus)
+
+        data = bytearray()
+
+        # as many whole samples per read as the transport allows, i.e. all
+        # of them on SPI and 5 per read on i2c (32 byte block reads)
+        samplesPerRead = self.transport.maxBlock//6
+
+        for i in range(0, count, samplesPerRead):
+            data.extend(self.multiple_access_read(0x28, min(samplesPerRead, count-i)*6))
+
+        samples = decode_samples(data, self.dataShift)
+
+        if units is not None:
+            samples = self.convert_units(samples, units)
+
+        self.count_fifo_read(count, drainTime, fifoStatus, edge)
+
+        if timestamps:
+            return samples, self.sampleClock.timestamps(count)
+
+        return samples
+
+    def read_fifo_into(self, out, units=None):
+        """read_fifo_into, function to read the samples in the fifo, as
+        read_fifo, decoding them into out instead of returning new arrays.
+        out is a numpy array of (n, 3) or 3n values, or a flat array/list of
+        x, y, z values, int16 for raw values or float for units (mg, g or
+        m/s2), and C contiguous if it is a numpy array. At most n samples are read, the rest are left in the fifo.
+        Returns the number of samples read into the start of out.
+
+        The transfers reuse preallocated buffers (see
+        multiple_access_read_into), and with numpy the samples are decoded
+        with views kept for the last out array, so repeated reads into the
+        same out allocate nothing per sample. Timestamps for the samples
+        are given by sampleClock.timestamps(count)"""
+
+        isArray = load_numpy() is not None and isinstance(out, numpy.ndarray)
+        check_out(out, units, isArray)
+
+        if isArray and out is not self.intoOut:
+            if not out.flags.c_contiguous:
+                raise ValueError('out array must be C contiguous')
+            if out.size % 3 != 0:
+                raise ValueError('out array needs 3 values per sample, size: '+str(out.size))
+
+        self.multiple_access_read_into(0x2F, self.statusBuffer)
+        drainTime = time.monotonic_ns()
+        fifoStatus = self.statusBuffer[0]
+        count = fifo_count(fifoStatus)
+
+        if isArray:
+            if self.xyzRaw is None:
+                self.into_arrays()
+            if out is not self.intoOut:
+                rows = out.view()
+                rows.shape = (-1, 3)
+                self.intoOut = out
+                self.intoRows = [rows[:n] for n in range(min(32, len(rows)) + 1)]
+            count = min(count, len(self.intoRows) - 1)
+        else:
+            count = min(count, len(out)//3)
+
+        samplesPerRead = self.transport.maxBlock//6
+        i = 0
+
+        while i < count:
+            n = min(samplesPerRead, count-i)
+            view = self.fifoViews[i][n]
+            if view is None:
+                view = self.fifoViews[i][n] = memoryview(self.fifoBuffer)[i*6:(i+n)*6]
+            self.multiple_access_read_into(0x28, view)
+            i += n
+
+        factor = None
+        if units is not None:
+            factor = self.unit_factor(units)
+
+        if isArray:
+            self.decode_array_into(self.fifoRaw[count], self.intoRows[count], factor)
+        else:
+            decode_samples_into(self.fifoBuffer, out, count*3, self.dataShift, factor)
+
+        self.count_fifo_read(count, drainTime, fifoStatus)
+
+        return count
+
+    def read_xyz(self, units=None):
+        """read_xyz, function to read the x, y and z axis accelerometer
+        values in a single burst read of OUT_X_L to OUT_Z_H (0x28-0x2D).
+        Returns a tuple (x, y, z) of raw values, or converted to units;
+        mg, g or m/s2"""
+
+        # output in 2s complement, little endian, left justified
+        x, y, z = struct.unpack('<hhh', bytearray(self.read_xyz_raw()))
+
+        shift = self.dataShift
+
+        if units is not None:
+            factor = self.unit_factor(units)
+            return ((x>>shift)*factor, (y>>shift)*factor, (z>>shift)*factor)
+
+        return (x>>shift, y>>shift, z>>shift)
+
+    def read_xyz_into(self, out, units=None):
+        """read_xyz_into, function to read the x, y and z axis values, as
+        read_xyz, into the first 3 values of out (a numpy array, array or
+        list; int16 for raw values or float for units, mg, g or m/s2). A
+        numpy out must be C contiguous. The transfer reuses a preallocated
+        buffer, see read_fifo_into"""
+
+        isArray = load_numpy() is not None and isinstance(out, numpy.ndarray)
+        check_out(out, units, isArray)
+
+        if isArray and out is not self.xyzOut:
+            if not out.flags.c_contiguous:
+                raise ValueError('out array must be C contiguous')
+            if out.size < 3:
+                raise ValueError('out array needs at least 3 values, size: '+str(out.size))
+            view = out
+            if out.shape != (3,):
+                view = out.view()
+                view.shape = (out.size,)
+                view = view[:3]
+            self.xyzOut = out
+            self.xyzOutView = view
+
+        self.multiple_access_read_into(0x28, self.xyzBuffer)
+
+        factor = None
+        if units is not None:
+            factor = self.unit_factor(units)
+
+        if isArray:
+            if self.xyzRaw is None:
+                self.into_arrays()
+            self.decode_array_into(self.xyzRaw, self.xyzOutView, factor)
+        else:
+            decode_samples_into(self.xyzBuffer, out, 3, self.dataShift, factor)
 
         return
 
+    def read_xyz_raw(self):
+        """read_xyz_raw, function to read the 6 raw output bytes
+        OUT_X_L, OUT_X_H, OUT_Y_L, OUT_Y_H, OUT_Z_L, OUT_Z_H (0x28-0x2D)
+        in a single burst read"""
+
+        return self.multiple_access_read(0x28, 6)
+
     def set_4D(self, enable='on'):
         """set_4D, function to turn 4D detection on or off. This sets
         bit 3 of CTRL_REG5 (0x24)"""
 
-        CTRL_REG5 = self.single_access_read(0x24)
+        CTRL_REG5 = self.shadow_read(0x24)
 
         if enable == 'off':
             enableBit = 0b0
@@ -294,7 +1957,7 @@ class Accelerometer:
 
         #print (bin(CTRL_REG5)) # for testing
 
-        self.single_access_write(0x24, CTRL_REG5)
+        self.shadow_write(0x24, CTRL_REG5)
 
         return
 
@@ -302,7 +1965,7 @@ class Accelerometer:
         """set_adcOn, function to enable/disable the aux 10 bit adc
         converter feature.  This sets bit 7 of TEMP_CFG_REG (0x1F)"""
 
-        TEMP_CFG_REG = self.single_access_read(0x1F)
+        TEMP_CFG_REG = self.shadow_read(0x1F)
 
         adcBit = 0b0  # default value
 
@@ -314,7 +1977,7 @@ class Accelerometer:
 
         #print (bin(TEMP_CFG_REG)) # for testing
 
-        self.single_access_write(0x1F, TEMP_CFG_REG)
+        self.shadow_write(0x1F, TEMP_CFG_REG)
 
         return
 
@@ -322,7 +1985,7 @@ class Accelerometer:
         """set_BDU, function to enable/disable the block data update
         feature.  This sets bit 7 of CTRL_REG4 (0x23)"""
 
-        CTRL_REG4 = self.single_access_read(0x23)
+        CTRL_REG4 = self.shadow_read(0x23)
 
         bduBit = 0b0  # default value
 
@@ -334,7 +1997,7 @@ class Accelerometer:
 
         #print (bin(CTRL_REG4)) # for testing
 
-        self.single_access_write(0x23, CTRL_REG4)
+        self.shadow_write(0x23, CTRL_REG4)
 
         return
 
@@ -347,7 +2010,7 @@ class Accelerometer:
 
         #print(hex(CLICK_CFG),bin(CLICK_CFG))  # for testing
 
-        self.single_access_write(0x38, CLICK_CFG)
+        self.shadow_write(0x38, CLICK_CFG)
 
         return
 
@@ -375,7 +2038,7 @@ class Accelerometer:
 
         #print(hex(thresholdBits),bin(thresholdBits)) # for testing
 
-        self.single_access_write(0x3A, thresholdBits)
+        self.shadow_write(0x3A, thresholdBits)
 
         return
 
@@ -394,7 +2057,7 @@ class Accelerometer:
 
         #print(bin(durationBits))  # for testing
 
-        self.single_access_write(0x3B, durationBits)
+        self.shadow_write(0x3B, durationBits)
 
         return
 
@@ -413,7 +2076,7 @@ class Accelerometer:
 
         #print(bin(durationBits))  # for testing
 
-        self.single_access_write(0x3C, durationBits)
+        self.shadow_write(0x3C, durationBits)
 
         return
 
@@ -432,7 +2095,7 @@ class Accelerometer:
 
         #print(bin(durationBits))  # for testing
 
-        self.single_access_write(0x3D, durationBits)
+        self.shadow_write(0x3D, durationBits)
 
         return
 
@@ -442,8 +2105,8 @@ class Accelerometer:
         This sets bit 6 of CTRL_REG5 (0x24) and bits 6 & 7 of FIFO_CTRL_REG
         (0x2E)"""
 
-        CTRL_REG5 = self.single_access_read(0x24)
-        FIFO_CTRL_REG = self.single_access_read(0x2E)
+        CTRL_REG5 = self.shadow_read(0x24)
+        FIFO_CTRL_REG = self.shadow_read(0x2E)
 
         enableBit = 0b1 # default value: enable
         modeBits = 0b00 # default value: bypass
@@ -459,11 +2122,11 @@ class Accelerometer:
 
         CTRL_REG5 = CTRL_REG5 & 0b10111111
         CTRL_REG5 = CTRL_REG5 | (enableBit<<6)
-        self.single_access_write(0x24, CTRL_REG5)
+        self.shadow_write(0x24, CTRL_REG5)
 
         FIFO_CTRL_REG = FIFO_CTRL_REG & 0b00111111
         FIFO_CTRL_REG = FIFO_CTRL_REG | (modeBits<<6)
-        self.single_access_write(0x2E, FIFO_CTRL_REG)
+        self.shadow_write(0x2E, FIFO_CTRL_REG)
 
         #print(hex(CTRL_REG5),bin(CTRL_REG5))  # for testing
         #print(hex(FIFO_CTRL_REG),bin(FIFO_CTRL_REG))  # for testing
@@ -474,7 +2137,7 @@ class Accelerometer:
         """set_fifo_threshold, function to the fifo threshold level.
         This sets bits 0-4 of FIFO_CTRL_REG (0x2E)"""
 
-        FIFO_CTRL_REG = self.single_access_read(0x2E)
+        FIFO_CTRL_REG = self.shadow_read(0x2E)
 
         threshold = int(abs(threshold))
 
@@ -483,7 +2146,7 @@ class Accelerometer:
 
         FIFO_CTRL_REG = FIFO_CTRL_REG & 0b11100000
         FIFO_CTRL_REG = FIFO_CTRL_REG | threshold
-        self.single_access_write(0x2E, FIFO_CTRL_REG)
+        self.shadow_write(0x2E, FIFO_CTRL_REG)
 
         #print(hex(FIFO_CTRL_REG),bin(FIFO_CTRL_REG))  # for testing
 
@@ -518,7 +2181,7 @@ class Accelerometer:
 
         #print(bin(CTRL_REG2)) # for testing
 
-        self.single_access_write(0x21, CTRL_REG2)
+        self.shadow_write(0x21, CTRL_REG2)
 
         return        
 
@@ -530,7 +2193,7 @@ class Accelerometer:
 
         #print(hex(INT1_CFG),bin(INT1_CFG))  # for testing
 
-        self.single_access_write(0x30, INT1_CFG)
+        self.shadow_write(0x30, INT1_CFG)
 
         return
 
@@ -549,7 +2212,7 @@ class Accelerometer:
 
         #print(bin(durationBits))  # for testing
 
-        self.single_access_write(0x33, durationBits)
+        self.shadow_write(0x33, durationBits)
 
         return        
 
@@ -562,7 +2225,7 @@ class Accelerometer:
 
         #print (bin(CTRL_REG3)) # for testing
 
-        self.single_access_write(0x22, CTRL_REG3)
+        self.shadow_write(0x22, CTRL_REG3)
 
         return
     
@@ -590,7 +2253,7 @@ class Accelerometer:
 
         #print(hex(thresholdBits),bin(thresholdBits)) # for testing
 
-        self.single_access_write(0x32, thresholdBits)
+        self.shadow_write(0x32, thresholdBits)
 
         return
         
@@ -600,7 +2263,7 @@ class Accelerometer:
         """set_ODR, function to set the output data rate (ODR) and the power
         mode (normal, low, or off). This sets bits 3-7 of CTRL_REG1 (0x20)"""
 
-        CTRL_REG1 = self.single_access_read(0x20)
+        CTRL_REG1 = self.shadow_read(0x20)
 
         odrBits = 0b0100  # default value 50Hz
         self.odr = 50     # default value 50Hz
@@ -621,12 +2284,20 @@ class Accelerometer:
         elif powerMode == 'low':
             lowPowerBit = 0b1
 
+        if powerMode in ('off', 'low'):
+            self.powerMode = powerMode
+        else:
+            self.powerMode = 'normal'
+
+        self.update_data_format()
+        self.sampleClock.reset(self.odr)
+
         CTRL_REG1 = CTRL_REG1 & 0b00000111
         CTRL_REG1 = CTRL_REG1 | ((odrBits<<4) + (lowPowerBit<<3))
 
         #print (bin(CTRL_REG1)) # for testing
 
-        self.single_access_write(0x20, CTRL_REG1)
+        self.shadow_write(0x20, CTRL_REG1)
 
         return
 
@@ -634,19 +2305,22 @@ class Accelerometer:
         """set_resolution, function to set the accelerometer resolution
         to either high or low.  This sets bit 3 of CTRL_REG4 (0x23)"""
 
-        CTRL_REG4 = self.single_access_read(0x23)
+        CTRL_REG4 = self.shadow_read(0x23)
 
         resBit = 0b0  # default value: low
 
         if res == 'high':
             resBit = 0b1
 
+        self.resolution = 'high' if resBit == 0b1 else 'low'
+        self.update_data_format()
+
         CTRL_REG4 = CTRL_REG4 & 0b11110111
         CTRL_REG4 = CTRL_REG4 | (resBit<<3)
 
         #print (bin(CTRL_REG4)) # for testing
 
-        self.single_access_write(0x23, CTRL_REG4)
+        self.shadow_write(0x23, CTRL_REG4)
 
         return
 
@@ -654,7 +2328,7 @@ class Accelerometer:
         """set_scale, function to set the scale used by the
         accelerometer; +-2g, 4g, 8g, 16g"""
 
-        CTRL_REG4 = self.single_access_read(0x23)
+        CTRL_REG4 = self.shadow_read(0x23)
 
         scaleBits = 0b00  # default value
         self.scale = 2
@@ -669,12 +2343,14 @@ class Accelerometer:
             scaleBits = 0b11
             self.scale = 16
 
+        self.update_data_format()
+
         CTRL_REG4 = CTRL_REG4 & 0b11001111
         CTRL_REG4 = CTRL_REG4 | (scaleBits<<4)
 
         #print (bin(CTRL_REG4)) # for testing
 
-        self.single_access_write(0x23, CTRL_REG4)
+        self.shadow_write(0x23, CTRL_REG4)
 
         return
 
@@ -686,6 +2362,239 @@ class Accelerometer:
 
         return
 
+    def set_watermark_mode(self, wakeRate=25, latency=0.002):
+        """set_watermark_mode, function to set up fifo watermark acquisition
+        for high ODRs; stream mode fifo, a watermark giving about wakeRate
+        wake ups per second and the watermark interrupt on the int1 pin.
+        Each wake up then drains the buffered samples with read_fifo, i.e.
+        start_stream(edgeSource=...) or start_stream('fifo').
+
+        The watermark is capped to leave room for the samples arriving in
+        latency (s), the time from the interrupt to the end of the drain,
+        so the fifo doesn't overrun. At high ODRs this gives more wake ups
+        than wakeRate, i.e. around 60/s at 1600Hz and 240/s at 5000Hz,
+        since the fifo only holds 32 samples. Set the ODR first. Returns
+        the samples per wake up. This sets FIFO_CTRL_REG (0x2E) and bits
+        2 & 4 of CTRL_REG3 (0x22)"""
+
+        samplesPerWake = watermark_samples(self.odr, wakeRate, latency)
+
+        self.set_fifo_mode('stream')
+        # the WTM bit is set once the fifo holds more than the threshold
+        self.set_fifo_threshold(samplesPerWake - 1)
+
+        CTRL_REG3 = self.shadow_read(0x22)
+        CTRL_REG3 = CTRL_REG3 & 0b11101111  # I1_ZYXDA off, one interrupt per sample
+        CTRL_REG3 = CTRL_REG3 | 0b00000100  # I1_WTM on
+        self.shadow_write(0x22, CTRL_REG3)
+
+        return samplesPerWake
+
+    def snapshot(self):
+        """snapshot, function to burst read the writable control registers
+        and return them as a Profile, which can later be restored with
+        apply, i.e. after a brown out"""
+
+        image = self.read_register_image()
+
+        if self.shadow is not None:
+            self.shadow = dict(image)
+
+        return Profile(registers=image)
+
+    def stats(self):
+        """stats, function to return the bus statistics collected since
+        enable_stats or reset_stats as a dict (see BusStats.to_dict), None
+        if they are not enabled"""
+
+        if self.busStats is None:
+            return None
+
+        return self.busStats.to_dict()
+
+    def stream(self, blockSize=32, units=None, timeout=None):
+        """stream, function to return an iterator (SampleStream) of blocks of
+        blockSize samples, raw or converted to units (mg, g or m/s2). The
+        acquisition thread is started on the first block if it is not
+        already running, reading the fifo if it is enabled, otherwise
+        polling. Raw blocks are views of the stream buffer that stay valid
+        until the next block. Iteration ends if timeout (s) expires waiting
+        for a block, i.e.
+
+        for block in accel.stream(32, units='g') | LIS3DHDsp.lowpass(50):"""
+
+        return SampleStream(self, blockSize, units, timeout)
+
+    def start_stream(self, source='poll', bufferSize=4096, waitFunction=None,
+                     edgeSource=None):
+        """start_stream, function to start a background thread that reads
+        samples into a preallocated ring buffer (see SampleBuffer). Samples
+        are collected with read_available or wait.
+
+        source - poll: read_xyz each time the ZYXDA bit of STATUS_REG (0x27)
+                       is set, see poll_xyz
+                 drdy: read_xyz after each call of waitFunction, i.e. a wait
+                       on the int1 pin with set_int1_pin(drdy1=1)
+                 fifo: read_fifo after each call of waitFunction (i.e. the
+                       int1 pin with set_int1_pin(wtm=1)), or polled if no
+                       waitFunction is given, the sleep between reads
+                       adapting to the fill level (see DrainScheduler). The
+                       fifo must already be set up with set_fifo_mode or
+                       set_watermark_mode
+        waitFunction - function that blocks until the interrupt fires, e.g.
+                       lambda: GPIO.wait_for_edge(pin, GPIO.RISING, timeout=500)
+        edgeSource - edge source for the int1 pin (see LIS3DHGpio), used in
+                     place of source and waitFunction. The read path follows
+                     CTRL_REG3 (0x22): read_fifo if set_int1_pin(wtm=1),
+                     read_xyz if set_int1_pin(drdy1=1). The kernel timestamps
+                     of the edges time the samples in sampleClock, and the
+                     last one is kept in streamEdgeTime
+
+        Raises ValueError for an unknown source, or drdy without a
+        waitFunction, before any thread is started"""
+
+        if edgeSource is None:
+            if source not in ('poll', 'drdy', 'fifo'):
+                raise ValueError('Unknown stream source: '+str(source))
+            if source == 'drdy' and waitFunction is None:
+                raise ValueError('drdy stream needs a waitFunction or edgeSource')
+
+        self.stop_stream()
+
+        if edgeSource is not None:
+            if self.shadow_read(0x22) & 0b00000100:  # I1_WTM bit
+                source = 'fifo'
+            else: # I1_ZYXDA bit
+                source = 'drdy'
+            waitFunction = None
+
+        self.streamBuffer = SampleBuffer(bufferSize)
+        self.streamError = None
+        self.streamStop.clear()
+
+        self.streamThread = threading.Thread(target=self.stream_loop,
+                                             args=(source, waitFunction, edgeSource))
+        self.streamThread.daemon = True
+        self.streamThread.start()
+
+        return
+
+    def stop_stream(self):
+        """stop_stream, function to stop the background acquisition thread
+        started by start_stream. Samples already collected stay available"""
+
+        if self.streamThread is not None:
+            self.streamStop.set()
+            self.streamThread.join()
+            self.streamThread = None
+
+        return
+
+    def stream_loop(self, source, waitFunction, edgeSource=None):
+        """stream_loop, acquisition loop run by the start_stream thread"""
+
+        buf = self.streamBuffer
+
+        # polled fifo reads aim for the watermark, or half full, leaving
+        # room for the samples arriving while the fifo is drained. The
+        # watermark is also the fifo level a watermark edge fires at
+        limit = fifo_limit(self.odr)
+        level = (self.shadow_read(0x2E) & 0b00011111) + 1
+        target = level
+        if target == 1:
+            target = limit//2
+        scheduler = DrainScheduler(self.odr, min(target, limit), limit)
+        self.streamScheduler = scheduler
+
+        try:
+            while not self.streamStop.is_set():
+
+                if edgeSource is not None:
+                    edges = edgeSource.wait(0.1)
+                    edge = None
+                    if len(edges) > 0:
+                        self.streamEdgeTime = edges[-1]
+                        edge = (edges[-1], level)
+
+                    if source == 'fifo':
+                        # after a timeout drain anyway, in case an edge was missed
+                        samples = self.read_fifo(edge=edge)
+                        if len(samples) > 0:
+                            buf.write(samples)
+                    elif len(edges) > 0:
+                        # one edge per sample, the newest is read
+                        buf.write(self.read_xyz())
+                        self.sampleClock.add(len(edges), edges[-1])
+                    elif self.single_access_read(0x27) & 0b00001000:
+                        # a missed edge leaves int1 high until the data is read
+                        buf.write(self.read_xyz())
+                        self.sampleClock.add(1, time.monotonic_ns())
+
+                elif source == 'fifo':
+                    if waitFunction is not None:
+                        waitFunction()
+                    wakeTime = time.monotonic()
+                    overruns = self.dataLoss['fifoOverruns']
+                    samples = self.read_fifo()
+                    if len(samples) > 0:
+                        buf.write(samples)
+                    if waitFunction is None:
+                        delay = scheduler.update(self.lastFifoCount,
+                                                 self.dataLoss['fifoOverruns'] > overruns,
+                                                 wakeTime)
+                        # counting the time spent draining
+                        self.streamStop.wait(max(0.0, wakeTime + delay - time.monotonic()))
+
+                elif source == 'drdy':
+                    waitFunction()
+                    buf.write(self.read_xyz())
+
+                else: # poll
+                    sample = self.poll_xyz()
+                    if sample is not None:
+                        buf.write(sample)
+                    else:
+                        self.streamStop.wait(0.25/self.odr)
+
+        except Exception as e:
+            self.streamError = e
+
+        finally:
+            # wakes a consumer blocked in wait, which then stops or
+            # raises streamError
+            buf.close()
+
+        return
+
+    def wait(self, count, timeout=None):
+        """wait, function to block until count samples have been collected
+        by the acquisition thread and return a view of them, see
+        start_stream and SampleBuffer.wait. Returns None if the timeout (s)
+        expires or the acquisition thread stops first, raises the error it
+        stopped on if it failed"""
+
+        samples = self.streamBuffer.wait(count, timeout)
+
+        if samples is None and self.streamError is not None:
+            raise self.streamError
+
+        return samples
+
+    def unit_factor(self, units='g'):
+        """unit_factor, function to return the factor converting raw values
+        to mg, g or m/s2 with the current scale, power mode and resolution"""
+
+        return self.sensitivity*unitFactors[units]
+
+    def update_data_format(self):
+        """update_data_format, function to work out the output data shift
+        and sensitivity from the tracked scale, power mode and resolution"""
+
+        self.dataShift = data_shift(self.powerMode, self.resolution)
+        self.sensitivity = sensitivityTable[(self.scale, self.dataShift)]
+
+        return
+
     def x_axis_reading(self):
         """x_axis_reading, function to read the x axis accelerometer value"""
 
@@ -693,7 +2602,7 @@ class Accelerometer:
         xH = self.single_access_read(0x29)
         xL = self.single_access_read(0x28)
 
-        xTotal = self.twos_complement_conversion(xH, xL)
+        xTotal = self.twos_complement_conversion(xH, xL, self.dataShift)
 
         #print (bin(xH),bin(xL),bin(xTotal), xTotal)
         
@@ -706,7 +2615,7 @@ class Accelerometer:
         yH = self.single_access_read(0x2B)
         yL = self.single_access_read(0x2A)
 
-        yTotal = self.twos_complement_conversion(yH, yL)
+        yTotal = self.twos_complement_conversion(yH, yL, self.dataShift)
 
         #print (bin(yH),bin(yL),bin(yTotal), yTotal)
         
@@ -719,21 +2628,33 @@ class Accelerometer:
         zH = self.single_access_read(0x2D)
         zL = self.single_access_read(0x2C)
 
-        zTotal = self.twos_complement_conversion(zH, zL)
+        zTotal = self.twos_complement_conversion(zH, zL, self.dataShift)
 
         #print (bin(zH),bin(zL),bin(zTotal), zTotal)
         
         return zTotal
 
-    def __del__(self):
-        """__del__, cleanup i2c or SPI connections"""
+    def close(self):
+        """close, function to put the accelerometer in power down mode and
+        close its transport. Shared bus handles are closed once no other
+        accelerometer is using them"""
+
+        if getattr(self, 'transport', None) is None:  # closed or never opened
+            return
+
+        self.stop_stream()
 
         self.set_ODR(odr=50, powerMode='off') # put the accel in power down mode
 
-        if self.mode == 'spi':    
-            self.spi.close()
-        else:  #i2C    
-            self.bus.close()
+        self.transport.close()
+        self.transport = None
+
+        return
+
+    def __del__(self):
+        """__del__, cleanup i2c or SPI connections"""
+
+        self.close()
 
 
 
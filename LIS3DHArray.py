@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""LIS3DHArray, sampling of several LIS3DH accelerometers at once
+
+created Oct 18, 2026"""
+
+"""
+Copyright 2020 Owain Martin
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+""" Usage:
+
+    import LIS3DH, LIS3DHArray
+
+    sensors = LIS3DHArray.SensorArray(period=0.02)
+    sensors.add('front', LIS3DH.Accelerometer('i2c', i2cAddress=0x18))
+    sensors.add('back', LIS3DH.Accelerometer('i2c', i2cAddress=0x19))
+    sensors.add('motor', LIS3DH.Accelerometer('spi', spiPort=0, spiCS=0))
+    ... set up each accelerometer, i.e. set_ODR and set_fifo_mode('stream')
+    sensors.start()
+
+    while True:
+        roundTime, blocks = sensors.read()   # blocks['front'], blocks['motor'] ...
+
+Devices on the same physical bus (see Accelerometer.busKey) are read one
+after the other by one worker thread per bus, so separate buses are read
+at the same time. Every worker reads all of its devices once per period on
+a shared schedule, and the blocks of each round are handed back together."""
+
+import time, threading
+
+class SensorArray:
+    """SensorArray, reads a set of Accelerometers every period (s), one
+    worker thread per bus.
+
+    method - fifo: read_fifo each round, the fifo must be enabled
+             poll: read_xyz each round
+    maxRounds - completed rounds kept for read before the oldest are
+                dropped"""
+
+    def __init__(self, period=0.02, method='fifo', maxRounds=100):
+
+        self.period = period
+        self.method = method
+        self.maxRounds = maxRounds
+        self.devices = []  # (name, accelerometer, bus)
+        self.workers = []
+        self.stopEvent = threading.Event()
+        self.condition = threading.Condition()
+        self.rounds = {}        # round number: {name: block}
+        self.roundBuses = {}    # round number: buses finished
+        self.nextRound = 0      # next round to hand back with read
+        self.droppedRounds = 0
+        self.errors = {}        # name: last exception raised reading it
+        self.startTime = None
+        self.busCount = 0
+
+    def add(self, name, accel, bus=None):
+        """add, function to add an Accelerometer to the array. bus defaults
+        to the accelerometer's busKey; devices with the same bus are read by
+        the same worker"""
+
+        if bus is None:
+            bus = accel.busKey
+
+        self.devices.append((name, accel, bus))
+
+        return
+
+    def buses(self):
+        """buses, function to return {bus: [(name, accelerometer), ...]}"""
+
+        buses = {}
+
+        for name, accel, bus in self.devices:
+            buses.setdefault(bus, []).append((name, accel))
+
+        return buses
+
+    def start(self):
+        """start, function to start one worker thread per bus"""
+
+        self.stop()
+
+        self.stopEvent.clear()
+        self.rounds = {}
+        self.roundBuses = {}
+        self.nextRound = 0
+        self.startTime = time.monotonic() + self.period
+
+        buses = self.buses()
+        self.busCount = len(buses)
+
+        for bus in buses:
+            worker = threading.Thread(target=self.worker, args=(buses[bus],))
+            worker.daemon = True
+            worker.start()
+            self.workers.append(worker)
+
+        return
+
+    def stop(self):
+        """stop, function to stop the worker threads"""
+
+        self.stopEvent.set()
+
+        for worker in self.workers:
+            worker.join()
+
+        self.workers = []
+
+        return
+
+    def worker(self, devices):
+        """worker, loop run by each bus worker thread"""
+
+        roundNumber = 0
+
+        while True:
+            delay = self.startTime + roundNumber*self.period - time.monotonic()
+
+            if self.stopEvent.wait(max(0.0, delay)):
+                break
+
+            blocks = {}
+
+            for name, accel in devices:
+                try:
+                    if self.method == 'poll':
+                        blocks[name] = accel.read_xyz()
+                    else:
+                        blocks[name] = accel.read_fifo()
+                except Exception as e:
+                    self.errors[name] = e
+                    blocks[name] = None
+
+            with self.condition:
+                if roundNumber >= self.nextRound:
+                    self.rounds.setdefault(roundNumber, {}).update(blocks)
+                    self.roundBuses[roundNumber] = self.roundBuses.get(roundNumber, 0) + 1
+                    self.drop_old_rounds()
+                    self.condition.notify_all()
+
+            roundNumber += 1
+
+        return
+
+    def drop_old_rounds(self):
+        """drop_old_rounds, function to drop the oldest rounds if the reader
+        has fallen more than maxRounds behind. Called with the condition
+        held"""
+
+        while len(self.rounds) > self.maxRounds:
+            self.rounds.pop(self.nextRound, None)
+            self.roundBuses.pop(self.nextRound, None)
+            self.nextRound += 1
+            self.droppedRounds += 1
+
+        return
+
+    def read(self, timeout=None):
+        """read, function to wait for the next round that every bus worker
+        has finished and return (round start time (time.monotonic), {name:
+        block}). Blocks are None for devices that failed to read. Returns
+        None if the timeout (s) expires first. An array with no devices
+        returns an empty dict of blocks straight away"""
+
+        with self.condition:
+            finished = lambda: self.roundBuses.get(self.nextRound, 0) >= self.busCount
+
+            if not self.condition.wait_for(finished, timeout):
+                return None
+
+            # no round is stored if there are no buses to finish it
+            roundNumber = self.nextRound
+            blocks = self.rounds.pop(roundNumber, {})
+            self.roundBuses.pop(roundNumber, None)
+            self.nextRound += 1
+
+        roundTime = None
+        if self.startTime is not None:
+            roundTime = self.startTime + roundNumber*self.period
+
+        return (roundTime, blocks)
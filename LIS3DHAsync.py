@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""LIS3DHAsync, asyncio wrapper for the LIS3DH accelerometer module
+
+created Oct 18, 2026"""
+
+"""
+Copyright 2020 Owain Martin
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import asyncio, functools, os, time, array
+from concurrent.futures import ThreadPoolExecutor
+
+import LIS3DH
+
+class AsyncAccelerometer:
+    """AsyncAccelerometer, wraps an LIS3DH.Accelerometer so it can be used
+    from an asyncio event loop. All bus access is done on a single worker
+    thread, so calls never block the loop and never overlap on the bus.
+
+    Any Accelerometer function can be awaited through the wrapper, i.e.
+    await accel.set_ODR(odr=400) or x, y, z = await accel.read_xyz()"""
+
+    def __init__(self, accel, executor=None):
+
+        self.accel = accel
+
+        if executor is None:
+            executor = ThreadPoolExecutor(max_workers=1)
+
+        self.executor = executor
+        self.scheduler = None  # DrainScheduler of a polled fifo stream
+
+    def __getattr__(self, name):
+        """__getattr__, function to return awaitable versions of the
+        wrapped Accelerometer's functions"""
+
+        attr = getattr(self.accel, name)
+
+        if not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        async def run_function(*args, **kwargs):
+            return await self.run(attr, *args, **kwargs)
+
+        return run_function
+
+    async def run(self, function, *args, **kwargs):
+        """run, function to run a blocking function on the bus executor"""
+
+        loop = asyncio.get_running_loop()
+
+        return await loop.run_in_executor(self.executor,
+                                          functools.partial(function, *args, **kwargs))
+
+    async def read_block(self, count):
+        """read_block, function to read count samples with poll_xyz. Each
+        poll is a separate job on the executor with the waits between
+        them on the event loop, so other calls can run in between and
+        cancelling stops it at the next poll"""
+
+        samples = []
+        sleepTime = 0.25/self.accel.odr
+
+        while len(samples) < count*3:
+            sample = await self.run(self.accel.poll_xyz)
+            if sample is not None:
+                samples.extend(sample)
+            else:
+                await asyncio.sleep(sleepTime)
+
+        if LIS3DH.load_numpy() is not None:
+            return LIS3DH.numpy.array(samples, dtype=LIS3DH.numpy.int16).reshape(-1, 3)
+
+        return array.array('h', samples)
+
+    async def stream(self, source='fifo', blockSize=32, eventFd=None):
+        """stream, async generator yielding blocks of samples.
+
+        source - fifo: drain the fifo with read_fifo, set the fifo up first
+                       with set_fifo_mode (and set_fifo_threshold/set_int1_pin
+                       if eventFd is used)
+                 poll: read blockSize samples polling STATUS_REG
+        blockSize - samples per block in poll mode, and the fifo fill to
+                    aim for if there is no eventFd, capped at half of
+                    LIS3DH.fifo_limit (as stream_loop without a watermark).
+                    The sleeps between reads then come from a
+                    LIS3DH.DrainScheduler, adapting to the fill each read
+                    finds and backing off after an overrun
+        eventFd - optional file descriptor (or object with fileno()) that
+                  becomes readable when the int1 pin fires, i.e. a gpio line
+                  event fd. It is watched by the event loop, no thread waits
+                  on it"""
+
+        loop = asyncio.get_running_loop()
+        event = None
+
+        if eventFd is not None:
+            if hasattr(eventFd, 'fileno'):
+                eventFd = eventFd.fileno()
+
+            event = asyncio.Event()
+
+            def on_readable():
+                os.read(eventFd, 4096)  # consume the pending edge events
+                event.set()
+
+            loop.add_reader(eventFd, on_readable)
+
+        accel = self.accel
+        scheduler = None
+        nextTime = None
+
+        if source == 'fifo' and event is None:
+            limit = LIS3DH.fifo_limit(accel.odr)
+            scheduler = LIS3DH.DrainScheduler(accel.odr, min(blockSize, limit//2), limit)
+            self.scheduler = scheduler
+
+        try:
+            while True:
+
+                if source == 'poll':
+                    yield await self.read_block(blockSize)
+                    continue
+
+                if event is not None:
+                    await event.wait()
+                    event.clear()
+                elif nextTime is not None:
+                    await asyncio.sleep(max(0.0, nextTime - time.monotonic()))
+
+                wakeTime = time.monotonic()
+                overruns = accel.dataLoss['fifoOverruns']
+                block = await self.run(accel.read_fifo)
+
+                if scheduler is not None:
+                    # the delay runs from the wake up, counting the time
+                    # spent draining and yielding the block
+                    delay = scheduler.update(accel.lastFifoCount,
+                                             accel.dataLoss['fifoOverruns'] > overruns,
+                                             wakeTime)
+                    nextTime = wakeTime + delay
+
+                if len(block) > 0:
+                    yield block
+
+        finally:
+            if event is not None:
+                loop.remove_reader(eventFd)
+
+    def close(self):
+        """close, function to shut down the bus executor"""
+
+        self.executor.shutdown(wait=True)
+
+        return
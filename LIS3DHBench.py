@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""LIS3DHBench, benchmark of the LIS3DH module read paths run against the
+LIS3DHEmulator with simulated bus timing
+
+created Oct 18, 2026"""
+
+"""
+Copyright 2020 Owain Martin
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+""" Usage:
+
+    python3 -m LIS3DHBench                       # all buses, ODRs and methods
+    python3 -m LIS3DHBench --bus spi --odr 400 1250 --duration 2
+    python3 -m LIS3DHBench --json results.json   # for diffing between releases
+
+For each bus, ODR (the set_ODR table) and read method the benchmark reports
+- samplesPerSecond      sustained samples read per second
+- transactionsPerSample bus transactions per sample
+- bytesPerSample        bytes moved on the bus per sample
+- cpuPerSample          CPU time (us) per sample, not counting the busy
+                        waited simulated bus time
+- allocBytesPerSample   peak bytes allocated (tracemalloc) while reading,
+                        per sample, including the emulated device's bus
+                        transactions but not its sample generation
+- allocBytesPerExtraSample
+                        fifo methods, the peak bytes allocated for each
+                        extra sample in a read (32 against 8 samples per
+                        read); 0 when reads allocate nothing per sample
+
+Read methods
+- axis   x_axis_reading, y_axis_reading and z_axis_reading when STATUS_REG
+         shows new data, polled every 1/4 sample period
+- burst  read_xyz when STATUS_REG shows new data, polled the same way
+- fifo   read_fifo in stream mode, woken every 16 samples
+- burst_into, fifo_into
+         as burst and fifo with read_xyz_into and read_fifo_into, reusing
+         one output array. These read through EmulatedTransport.read_into,
+         standing in for the preallocated spidev/i2c-dev ioctl transfers
+         SpiTransport and I2cTransport use on Linux"""
+
+import sys, time, json, array, platform, argparse, tracemalloc
+
+import LIS3DH, LIS3DHEmulator
+
+# ODRs of set_ODR, 1600Hz and 5000Hz are low power mode only
+odrCases = [(1, 'normal'), (10, 'normal'), (25, 'normal'), (50, 'normal'),
+            (100, 'normal'), (200, 'normal'), (400, 'normal'),
+            (1250, 'normal'), (1600, 'low'), (5000, 'low')]
+
+methods = ['axis', 'burst', 'fifo', 'burst_into', 'fifo_into']
+
+class ManualClock:
+    """ManualClock, emulator clock that only moves when advanced"""
+
+    def __init__(self):
+
+        self.now = 0.0
+
+    def __call__(self):
+
+        return self.now
+
+    def advance(self, seconds):
+        """advance, function to move the clock forward"""
+
+        self.now += seconds
+
+        return
+
+def make_accelerometer(bus, odr, powerMode, method, clock=None, latency=None):
+    """make_accelerometer, function to return an emulated (device,
+    Accelerometer) pair set up for a benchmark case"""
+
+    device = LIS3DHEmulator.EmulatedLIS3DH(source=LIS3DHEmulator.SineSignal(5),
+                                           clock=clock, latency=latency)
+
+    if method.endswith('_into'):
+        accel = LIS3DH.Accelerometer(transport=LIS3DHEmulator.EmulatedTransport(device, bus))
+    elif bus == 'spi':
+        accel = LIS3DH.Accelerometer('spi', device=LIS3DHEmulator.EmulatedSpiDev(device))
+    else:
+        accel = LIS3DH.Accelerometer('i2c', i2cAddress=0x19,
+                                     device=LIS3DHEmulator.EmulatedSMBus(device, 0x19))
+
+    accel.set_ODR(odr=odr, powerMode=powerMode)
+    accel.axis_enable()
+    accel.set_BDU('on')
+
+    if method.startswith('fifo'):
+        accel.set_fifo_mode('stream')
+
+    return device, accel
+
+def read_function(accel, method):
+    """read_function, function to return a function that reads whatever
+    samples are available with method and returns how many it read"""
+
+    if method == 'fifo':
+        def read():
+            return len(accel.read_fifo())
+
+    elif method == 'fifo_into':
+        if LIS3DH.load_numpy() is not None:
+            out = LIS3DH.numpy.zeros((32, 3), dtype=LIS3DH.numpy.int16)
+        else:
+            out = array.array('h', [0]*96)
+
+        def read():
+            return accel.read_fifo_into(out)
+
+    elif method == 'burst_into':
+        if LIS3DH.load_numpy() is not None:
+            out = LIS3DH.numpy.zeros(3, dtype=LIS3DH.numpy.int16)
+        else:
+            out = array.array('h', [0]*3)
+        status = bytearray(1)
+
+        def read():
+            accel.multiple_access_read_into(0x27, status)
+            if status[0] & 0b00001000:  # ZYXDA bit
+                accel.read_xyz_into(out)
+                return 1
+            return 0
+
+    elif method == 'burst':
+        def read():
+            if accel.single_access_read(0x27) & 0b00001000:  # ZYXDA bit
+                accel.read_xyz()
+                return 1
+            return 0
+
+    else: # axis
+        def read():
+            if accel.single_access_read(0x27) & 0b00001000:  # ZYXDA bit
+                accel.x_axis_reading()
+                accel.y_axis_reading()
+                accel.z_axis_reading()
+                return 1
+            return 0
+
+    return read
+
+def measure_throughput(bus, odr, powerMode, method, duration, latency):
+    """measure_throughput, function to read for duration (s) in real time
+    and return the throughput figures"""
+
+    device, accel = make_accelerometer(bus, odr, powerMode, method, latency=latency)
+    read = read_function(accel, method)
+    wakePeriod = 16.0/odr
+    pollPeriod = 0.25/odr
+
+    device.transactions = 0
+    device.bytesTransferred = 0
+    device.busyTime = 0.0
+    samples = 0
+
+    startTime = time.perf_counter()
+    startCpu = time.process_time()
+    endTime = startTime + duration
+
+    while time.perf_counter() < endTime:
+        count = read()
+        samples += count
+
+        if method.startswith('fifo'):
+            time.sleep(max(0.0, min(wakePeriod, endTime - time.perf_counter())))
+        elif count == 0:
+            time.sleep(pollPeriod)
+
+    elapsed = time.perf_counter() - startTime
+    cpu = time.process_time() - startCpu - device.busyTime
+
+    result = {'samplesPerSecond': samples/elapsed, 'samples': samples}
+
+    if samples > 0:
+        result['transactionsPerSample'] = float(device.transactions)/samples
+        result['bytesPerSample'] = float(device.bytesTransferred)/samples
+        result['cpuPerSample'] = cpu*1e6/samples
+    else:
+        result['transactionsPerSample'] = None
+        result['bytesPerSample'] = None
+        result['cpuPerSample'] = None
+
+    return result
+
+def measure_allocations(bus, odr, powerMode, method, reads=50, samplesPerRead=None):
+    """measure_allocations, function to return the peak bytes allocated
+    per sample by the read path, using a manual emulator clock so every
+    read finds new data. The samples are generated before each read, so
+    the emulator's signal source isn't counted"""
+
+    clock = ManualClock()
+    device, accel = make_accelerometer(bus, odr, powerMode, method, clock=clock)
+    read = read_function(accel, method)
+
+    if samplesPerRead is None:
+        samplesPerRead = 16 if method.startswith('fifo') else 1
+
+    clock.advance(1.0/odr)  # start the sample timing
+    read()
+    read()  # the into methods set up their buffer views on first use
+
+    total = 0
+    samples = 0
+
+    tracemalloc.start()
+    try:
+        for i in range(reads):
+            clock.advance(float(samplesPerRead)/odr)
+            device.update()
+            current = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            samples += read()
+            total += tracemalloc.get_traced_memory()[1] - current
+    finally:
+        tracemalloc.stop()
+
+    if samples == 0:
+        return None
+
+    return float(total)/samples
+
+def measure_extra_allocations(bus, odr, powerMode, method, reads=50):
+    """measure_extra_allocations, function to return the peak bytes
+    allocated for each extra sample in a fifo read, from reads of 8 and 32
+    samples"""
+
+    small = measure_allocations(bus, odr, powerMode, method, reads, 8)
+    large = measure_allocations(bus, odr, powerMode, method, reads, 32)
+
+    if small is None or large is None:
+        return None
+
+    return max(0.0, (large*32 - small*8)/24.0)
+
+def run_case(bus, odr, powerMode, method, duration=1.0, latency=None):
+    """run_case, function to run one benchmark case and return its results
+    as a dict"""
+
+    if latency is None:
+        latency = LIS3DHEmulator.busTimings[bus]
+
+    result = {'bus': bus, 'odr': odr, 'powerMode': powerMode, 'method': method}
+    result.update(measure_throughput(bus, odr, powerMode, method, duration, latency))
+    result['allocBytesPerSample'] = measure_allocations(bus, odr, powerMode, method)
+    result['allocBytesPerExtraSample'] = None
+
+    if method.startswith('fifo'):
+        result['allocBytesPerExtraSample'] = measure_extra_allocations(bus, odr, powerMode, method)
+
+    return result
+
+def format_value(value, digits=1):
+    """format_value, function to format a result value for the table"""
+
+    if value is None:
+        return '-'
+
+    return ('%.'+str(digits)+'f') % value
+
+def main(argv=None):
+    """main, function to run the benchmark from the command line"""
+
+    parser = argparse.ArgumentParser(description='LIS3DH read path benchmark')
+    parser.add_argument('--bus', nargs='+', default=['spi', 'i2c'], choices=['spi', 'i2c'])
+    parser.add_argument('--odr', nargs='+', type=int,
+                        default=[odr for odr, powerMode in odrCases])
+    parser.add_argument('--method', nargs='+', default=methods, choices=methods)
+    parser.add_argument('--duration', type=float, default=1.0,
+                        help='seconds per case (default 1)')
+    parser.add_argument('--latency', nargs=2, type=float, metavar=('FIXED', 'PERBYTE'),
+                        help='simulated cost per transaction and per byte (s)')
+    parser.add_argument('--json', metavar='FILE',
+                        help="write the results as json to FILE ('-' for stdout)")
+    args = parser.parse_args(argv)
+
+    powerModes = dict(odrCases)
+    results = []
+
+    for bus in args.bus:
+        for odr in args.odr:
+            for method in args.method:
+                result = run_case(bus, odr, powerModes.get(odr, 'normal'), method,
+                                  args.duration, args.latency)
+                results.append(result)
+
+                if args.json != '-':
+                    print(bus.ljust(4)+str(odr).rjust(6)+' '+method.ljust(10)+
+                          format_value(result['samplesPerSecond']).rjust(10)+' samples/s'+
+                          format_value(result['transactionsPerSample'], 2).rjust(8)+' trans/sample'+
+                          format_value(result['bytesPerSample'], 1).rjust(8)+' bytes/sample'+
+                          format_value(result['cpuPerSample'], 1).rjust(9)+' us cpu/sample'+
+                          format_value(result['allocBytesPerSample'], 1).rjust(8)+' alloc bytes/sample'+
+                          format_value(result['allocBytesPerExtraSample'], 1).rjust(7)+' per extra sample')
+
+    report = {'python': platform.python_version(),
+              'numpy': LIS3DH.load_numpy() is not None,
+              'duration': args.duration,
+              'results': results}
+
+    if args.json == '-':
+        json.dump(report, sys.stdout, indent=1, sort_keys=True)
+        print('')
+    elif args.json is not None:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=1, sort_keys=True)
+
+    return
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,494 @@
+#!/usr/bin/env python3
+"""LIS3DHDsp, block based processing of LIS3DH sample streams; filters,
+decimation and windowed RMS/peak
+
+created Oct 18, 2026"""
+
+"""
+Copyright 2020 Owain Martin
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+""" Usage:
+
+    import LIS3DH
+    from LIS3DHDsp import lowpass, decimate, rms
+
+    accel = LIS3DH.Accelerometer('spi', spiPort = 0, spiCS = 1)
+    accel.set_ODR(odr=1600, powerMode='low')
+    accel.set_watermark_mode(25)
+
+    for block in accel.stream(64, units='g') | lowpass(50) | decimate(8):
+        ... 200Hz samples, filtered to 50Hz
+
+Stages work on whole numpy blocks of samples (n rows, one column per axis)
+and keep their state between blocks, so a stream can be processed in any
+block size. Each stage takes the sample rate from the stage or stream
+before it (SampleStream.rate is the ODR), or from rate=... Stages can be
+chained before use, i.e. antiAlias = lowpass(50) | decimate(8), or used on
+their own with reset(rate) and process(block).
+
+numpy is required. The IIR filters use scipy.signal.sosfilt if scipy is
+installed, otherwise a (much slower) pure Python loop."""
+
+import math
+
+import numpy
+
+try:
+    from scipy import signal
+except ImportError:
+    signal = None
+
+class BlockStream:
+    """BlockStream, iterator of blocks with the sample rate (Hz) of the
+    blocks, as returned by the stages' apply"""
+
+    def __init__(self, blocks, rate=None):
+
+        self.blocks = iter(blocks)
+        self.rate = rate
+
+    def __iter__(self):
+
+        return self
+
+    def __next__(self):
+
+        return next(self.blocks)
+
+    def __or__(self, stage):
+
+        return stage.apply(self)
+
+class Stage:
+    """Stage, base class of the pipeline stages. rate is the input sample
+    rate (Hz), if not given it is taken from the stream the stage is
+    applied to"""
+
+    def __init__(self, rate=None):
+
+        self.rate = rate
+
+        if rate is not None:
+            self.reset(rate)
+
+    def __or__(self, stage):
+
+        return Chain([self, stage])
+
+    def __ror__(self, blocks):
+
+        return self.apply(blocks)
+
+    def apply(self, blocks):
+        """apply, function to return a BlockStream of the processed blocks
+        of an iterable of blocks. Empty blocks are not passed on"""
+
+        rate = self.rate
+        if rate is None:
+            rate = getattr(blocks, 'rate', None)
+
+        self.reset(rate)
+
+        return BlockStream(self.run(blocks), self.output_rate(rate))
+
+    def run(self, blocks):
+        """run, generator processing the blocks"""
+
+        for block in blocks:
+            block = self.process(block)
+            if len(block) > 0:
+                yield block
+
+        return
+
+    def reset(self, rate=None):
+        """reset, function to clear the stage state for a new stream at
+        rate (Hz)"""
+
+        return
+
+    def output_rate(self, rate):
+        """output_rate, function to return the output sample rate for an
+        input rate"""
+
+        return rate
+
+    def process(self, block):
+        """process, function to process one block and return the output"""
+
+        return block
+
+class Chain(Stage):
+    """Chain, stages run one after the other"""
+
+    def __init__(self, stages):
+
+        self.stages = list(stages)
+        self.rate = None
+
+    def __or__(self, stage):
+
+        return Chain(self.stages + [stage])
+
+    def apply(self, blocks):
+        """apply, function to apply each stage in turn"""
+
+        for stage in self.stages:
+            blocks = stage.apply(blocks)
+
+        return blocks
+
+    def reset(self, rate=None):
+        """reset, function to reset each stage with its input rate"""
+
+        for stage in self.stages:
+            if stage.rate is not None:
+                rate = stage.rate
+            stage.reset(rate)
+            rate = stage.output_rate(rate)
+
+        return
+
+    def output_rate(self, rate):
+        """output_rate, function to return the rate out of the last stage"""
+
+        for stage in self.stages:
+            if stage.rate is not None:
+                rate = stage.rate
+            rate = stage.output_rate(rate)
+
+        return rate
+
+    def process(self, block):
+        """process, function to run a block through every stage"""
+
+        for stage in self.stages:
+            block = stage.process(block)
+
+        return block
+
+def as_block(block):
+    """as_block, function to return a block as a float64 (n, channels)
+    array"""
+
+    block = numpy.asarray(block, dtype=numpy.float64)
+
+    if block.ndim == 1:
+        block = block.reshape(-1, 1)
+
+    return block
+
+def butterworth_sections(kind, cutoff, rate, order=2):
+    """butterworth_sections, function to design a digital Butterworth low
+    or high pass filter (kind) as second order sections, rows of b0, b1,
+    b2, a0, a1, a2 as used by scipy.signal.sosfilt"""
+
+    if rate is None:
+        raise ValueError('the filter needs a sample rate, give rate=...')
+
+    if not 0 < cutoff < rate/2.0:
+        raise ValueError('cutoff must be between 0 and half the sample rate')
+
+    w0 = 2*math.pi*cutoff/rate
+    sections = []
+
+    for k in range(order//2):
+        q = 1.0/(2*math.sin(math.pi*(2*k + 1)/(2.0*order)))
+        alpha = math.sin(w0)/(2*q)
+        cosW0 = math.cos(w0)
+        a0 = 1 + alpha
+
+        if kind == 'lowpass':
+            b = [(1 - cosW0)/2, 1 - cosW0, (1 - cosW0)/2]
+        else:
+            b = [(1 + cosW0)/2, -(1 + cosW0), (1 + cosW0)/2]
+
+        sections.append([b[0]/a0, b[1]/a0, b[2]/a0, 1.0, -2*cosW0/a0, (1 - alpha)/a0])
+
+    if order % 2:
+        k = math.tan(w0/2)
+        if kind == 'lowpass':
+            b = [k/(1 + k), k/(1 + k), 0.0]
+        else:
+            b = [1/(1 + k), -1/(1 + k), 0.0]
+        sections.append(b + [1.0, (k - 1)/(k + 1), 0.0])
+
+    return numpy.array(sections)
+
+class IirFilter(Stage):
+    """IirFilter, Butterworth low or high pass filter (kind) of cutoff
+    (Hz) and order, run as cascaded biquads. The state is started from the
+    first sample as if it had always been there, so there is no start up
+    transient from i.e. 1g of gravity"""
+
+    def __init__(self, kind='lowpass', cutoff=10.0, order=2, rate=None):
+
+        self.kind = kind
+        self.cutoff = cutoff
+        self.order = order
+        self.sections = None
+        self.state = None
+
+        Stage.__init__(self, rate)
+
+    def reset(self, rate=None):
+        """reset, function to design the filter for rate (Hz) and clear its
+        state"""
+
+        self.sections = butterworth_sections(self.kind, self.cutoff, rate, self.order)
+        self.state = None
+
+        return
+
+    def initial_state(self, first):
+        """initial_state, function to return the steady state of every
+        section for a constant input of first, shape (sections, 2,
+        channels)"""
+
+        state = numpy.zeros((len(self.sections), 2, len(first)))
+        x = first
+
+        for i, (b0, b1, b2, a0, a1, a2) in enumerate(self.sections):
+            y = x*(b0 + b1 + b2)/(1 + a1 + a2)  # DC gain
+            state[i, 0] = y - b0*x
+            state[i, 1] = b2*x - a2*y
+            x = y
+
+        return state
+
+    def process(self, block):
+        """process, function to filter a block"""
+
+        block = as_block(block)
+
+        if len(block) == 0:
+            return block
+
+        if self.state is None:
+            self.state = self.initial_state(block[0])
+
+        if signal is not None:
+            out, self.state = signal.sosfilt(self.sections, block, axis=0, zi=self.state)
+            return out
+
+        out = numpy.empty_like(block)
+
+        # transposed direct form II, the same state as sosfilt
+        for channel in range(block.shape[1]):
+            x = block[:, channel].tolist()
+            for i, (b0, b1, b2, a0, a1, a2) in enumerate(self.sections):
+                z1, z2 = self.state[i, 0, channel], self.state[i, 1, channel]
+                y = []
+                for value in x:
+                    output = b0*value + z1
+                    z1 = b1*value - a1*output + z2
+                    z2 = b2*value - a2*output
+                    y.append(output)
+                self.state[i, 0, channel], self.state[i, 1, channel] = z1, z2
+                x = y
+            out[:, channel] = x
+
+        return out
+
+class FirFilter(Stage):
+    """FirFilter, windowed sinc (Hamming) low or high pass FIR filter
+    (kind) of cutoff (Hz) with taps coefficients (made odd). Linear phase,
+    delaying the signal by (taps - 1)/2 samples"""
+
+    def __init__(self, kind='lowpass', cutoff=10.0, taps=63, rate=None):
+
+        self.kind = kind
+        self.cutoff = cutoff
+        self.taps = taps | 1
+        self.coefficients = None
+        self.history = None
+
+        Stage.__init__(self, rate)
+
+    def reset(self, rate=None):
+        """reset, function to design the filter for rate (Hz) and clear its
+        history"""
+
+        if rate is None:
+            raise ValueError('the filter needs a sample rate, give rate=...')
+
+        n = numpy.arange(self.taps) - (self.taps - 1)/2.0
+        h = numpy.sinc(2.0*self.cutoff/rate*n)*numpy.hamming(self.taps)
+        h = h/h.sum()
+
+        if self.kind == 'highpass':  # spectral inversion
+            h = -h
+            h[(self.taps - 1)//2] += 1.0
+
+        self.coefficients = h
+        self.history = None
+
+        return
+
+    def process(self, block):
+        """process, function to filter a block"""
+
+        block = as_block(block)
+
+        if len(block) == 0:
+            return block
+
+        if self.history is None:
+            # as if the first sample had always been there
+            self.history = numpy.repeat(block[:1], self.taps - 1, axis=0)
+
+        x = numpy.concatenate((self.history, block))
+        out = numpy.empty_like(block)
+
+        for channel in range(block.shape[1]):
+            out[:, channel] = numpy.convolve(x[:, channel], self.coefficients, 'valid')
+
+        self.history = x[len(x) - (self.taps - 1):]
+
+        return out
+
+class Decimate(Stage):
+    """Decimate, keeps every factor'th sample. Filter out everything above
+    the new rate/2 first, i.e. lowpass(rate/factor/2) | decimate(factor)"""
+
+    def __init__(self, factor=2, rate=None):
+
+        self.factor = int(factor)
+        self.offset = 0
+
+        Stage.__init__(self, rate)
+
+    def reset(self, rate=None):
+        """reset, function to start counting samples again"""
+
+        self.offset = 0
+
+        return
+
+    def output_rate(self, rate):
+        """output_rate, function to return rate/factor"""
+
+        if rate is None:
+            return None
+
+        return float(rate)/self.factor
+
+    def process(self, block):
+        """process, function to return every factor'th sample, counted
+        across blocks"""
+
+        block = numpy.asarray(block)
+        out = block[self.offset::self.factor]
+        self.offset = (self.offset - len(block)) % self.factor
+
+        return out
+
+class WindowStage(Stage):
+    """WindowStage, base class of stages giving one output row per window
+    of samples, collecting samples across blocks"""
+
+    def __init__(self, window=100, rate=None):
+
+        self.window = int(window)
+        self.leftover = None
+
+        Stage.__init__(self, rate)
+
+    def reset(self, rate=None):
+        """reset, function to drop any partly filled window"""
+
+        self.leftover = None
+
+        return
+
+    def output_rate(self, rate):
+        """output_rate, function to return rate/window"""
+
+        if rate is None:
+            return None
+
+        return float(rate)/self.window
+
+    def windows(self, block):
+        """windows, function to return the complete windows of the samples
+        so far, shape (windows, window, channels)"""
+
+        block = as_block(block)
+
+        if self.leftover is not None:
+            block = numpy.concatenate((self.leftover, block))
+
+        count = len(block)//self.window
+        self.leftover = block[count*self.window:].copy()
+
+        return block[:count*self.window].reshape(count, self.window, block.shape[1])
+
+class Rms(WindowStage):
+    """Rms, root mean square of each window of samples"""
+
+    def process(self, block):
+        """process, function to return the RMS of each completed window"""
+
+        return numpy.sqrt(numpy.mean(numpy.square(self.windows(block)), axis=1))
+
+class Peak(WindowStage):
+    """Peak, largest absolute value of each window of samples"""
+
+    def process(self, block):
+        """process, function to return the peak of each completed window"""
+
+        windows = self.windows(block)
+
+        if len(windows) == 0:
+            return numpy.zeros((0, windows.shape[2]))
+
+        return numpy.max(numpy.abs(windows), axis=1)
+
+def lowpass(cutoff, order=2, rate=None):
+    """lowpass, function to return a Butterworth low pass IirFilter"""
+
+    return IirFilter('lowpass', cutoff, order, rate)
+
+def highpass(cutoff, order=2, rate=None):
+    """highpass, function to return a Butterworth high pass IirFilter"""
+
+    return IirFilter('highpass', cutoff, order, rate)
+
+def fir_lowpass(cutoff, taps=63, rate=None):
+    """fir_lowpass, function to return a low pass FirFilter"""
+
+    return FirFilter('lowpass', cutoff, taps, rate)
+
+def fir_highpass(cutoff, taps=63, rate=None):
+    """fir_highpass, function to return a high pass FirFilter"""
+
+    return FirFilter('highpass', cutoff, taps, rate)
+
+def decimate(factor, rate=None):
+    """decimate, function to return a Decimate stage"""
+
+    return Decimate(factor, rate)
+
+def rms(window, rate=None):
+    """rms, function to return an Rms stage of window samples"""
+
+    return Rms(window, rate)
+
+def peak(window, rate=None):
+    """peak, function to return a Peak stage of window samples"""
+
+    return Peak(window, rate)
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""LIS3DHDutyCycle, controller switching an LIS3DH between a low power
+wake up mode and high rate fifo streaming on activity
+
+created Oct 18, 2026"""
+
+"""
+Copyright 2020 Owain Martin
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+""" Usage:
+
+    import LIS3DH, LIS3DHDutyCycle, LIS3DHGpio
+
+    accel = LIS3DH.Accelerometer('spi', spiPort = 0, spiCS = 1, shadow=True)
+    edges = LIS3DHGpio.GpioEdgeSource('/dev/gpiochip0', 17)   # INT1, optional
+    controller = LIS3DHDutyCycle.DutyCycleController(accel, wakeThreshold=256,
+                                                     activeOdr=400, quietTime=5,
+                                                     edgeSource=edges)
+
+    for block in controller.blocks(units='g'):
+        ... only called while there is activity
+
+While asleep the accelerometer runs in low power mode at sleepOdr with the
+inertial wake up interrupt (OR of the XH/YH/ZH events, as in example 2 of
+LIS3DHexample) latched and routed to the int1 pin. The host waits on the
+edge source, or reads INT1_SRC (0x31) every pollInterval without one, so
+the bus and CPU are idle apart from that. The latch holds the wake up until
+it is seen, and the fifo keeps streaming while asleep, so the samples
+leading up to the wake up are kept in wakeSamples.
+
+On waking the controller switches to normal mode at activeOdr with the fifo
+watermark on the int1 pin and yields blocks of samples. It goes back to
+sleep after quietTime (s) without a sample above quietThreshold (mg, by
+default half of wakeThreshold) on the wake up axes; the lower threshold
+and the quiet time give the hysteresis. Both set ups are Profiles applied
+with Accelerometer.apply, so a transition only writes the registers that
+differ (CTRL_REG1, CTRL_REG3 and FIFO_CTRL_REG), in two bus transactions
+with the register shadow enabled.
+
+highpass='on' sends the high pass filtered data to the interrupt generator
+(set_highpass_filter hpIS1), removing gravity so the z axis can be used."""
+
+import time, threading
+
+import LIS3DH
+
+class DutyCycleController:
+    """DutyCycleController, sleeps the accelerometer until an activity
+    interrupt, then streams the fifo until the activity stops.
+
+    wakeThreshold - wake up threshold (mg), see set_int1_threshold
+    wakeDuration - wake up duration (ms), see set_int1_duration
+    sleepOdr - ODR (Hz) in low power sleep mode
+    activeOdr - ODR (Hz) while active
+    quietThreshold - activity threshold (mg) while active, half of
+                     wakeThreshold if None
+    quietTime - time (s) without activity before going back to sleep
+    axes - wake up axes, any of x, y and z
+    edgeSource - edge source for the int1 pin (see LIS3DHGpio), INT1_SRC
+                 is polled every pollInterval (s) without one
+    wakeRate - fifo reads per second while active, see set_watermark_mode"""
+
+    def __init__(self, accel, wakeThreshold=256, wakeDuration=0, sleepOdr=10,
+                 activeOdr=400, quietThreshold=None, quietTime=2.0, axes='xy',
+                 highpass='off', edgeSource=None, pollInterval=0.1, wakeRate=25):
+
+        self.accel = accel
+        self.edgeSource = edgeSource
+        self.pollInterval = pollInterval
+        self.activeOdr = activeOdr
+        self.quietTime = quietTime
+        self.axes = [i for i in range(3) if 'xyz'[i] in axes]
+
+        if quietThreshold is None:
+            quietThreshold = wakeThreshold/2.0
+
+        self.quietThreshold = quietThreshold
+        self.highpass = highpass
+
+        self.state = 'off'
+        self.stopEvent = threading.Event()
+        self.wakeups = 0
+        self.wakeTime = None      # time.monotonic_ns of the last wake up
+        self.wakeSource = 0       # INT1_SRC at the last wake up
+        self.wakeSamples = None   # fifo samples (sleepOdr) before the last wake up
+        self.lastActivity = None  # time.monotonic of the last active sample
+        self.baseline = None      # mean of the last block, with highpass
+
+        # the register shadow lets apply skip the register reads and the
+        # unchanged registers at every transition
+        if accel.shadow is None:
+            accel.resync()
+
+        hpIS1 = 1 if highpass == 'on' else 0
+        samplesPerWake = LIS3DH.watermark_samples(activeOdr, wakeRate)
+
+        common = {'set_highpass_filter': ['normal', 0, 0, 0, 0, hpIS1],
+                  'latch_interrupt': 'on',
+                  'set_int1_config': {'aoi': 0, 'xh': int(0 in self.axes),
+                                      'yh': int(1 in self.axes),
+                                      'zh': int(2 in self.axes)},
+                  'set_int1_threshold': wakeThreshold,
+                  'set_fifo_mode': 'stream'}
+
+        sleepSettings = dict(common)
+        sleepSettings['set_ODR'] = {'odr': sleepOdr, 'powerMode': 'low'}
+        sleepSettings['set_int1_pin'] = {'aoi1': 1}
+        sleepSettings['set_int1_duration'] = wakeDuration
+        sleepSettings['set_fifo_threshold'] = 0
+
+        activeSettings = dict(common)
+        activeSettings['set_ODR'] = {'odr': activeOdr, 'powerMode': 'normal'}
+        activeSettings['set_int1_pin'] = {'wtm': 1}
+        # the watermark bit is set once the fifo holds more than the threshold
+        activeSettings['set_fifo_threshold'] = samplesPerWake - 1
+
+        # INT1_DURATION is left as set for sleepOdr while active
+        self.sleepProfile = LIS3DH.Profile(**sleepSettings)
+        self.activeProfile = LIS3DH.Profile(**activeSettings)
+
+        # polled fifo reads aim for the watermark, as in stream_loop
+        self.drainTarget = samplesPerWake
+        self.drainLimit = LIS3DH.fifo_limit(activeOdr)
+        self.scheduler = LIS3DH.DrainScheduler(activeOdr, samplesPerWake, self.drainLimit)
+
+    def sleep(self):
+        """sleep, function to put the accelerometer into low power mode with
+        the wake up interrupt armed"""
+
+        accel = self.accel
+
+        accel.apply(self.sleepProfile)
+        accel.read_fifo()        # so wakeSamples only holds sleepOdr samples
+        accel.get_int1_status()  # clears a latched interrupt from before
+        self.state = 'sleep'
+
+        return
+
+    def wake(self):
+        """wake, function to keep the samples leading up to the wake up
+        and switch the accelerometer to high rate fifo streaming"""
+
+        accel = self.accel
+
+        self.wakeSamples = accel.read_fifo()
+        accel.apply(self.activeProfile)
+        self.state = 'active'
+        self.wakeups += 1
+        self.lastActivity = time.monotonic()
+        self.baseline = None
+        self.scheduler.reset(self.activeOdr, self.drainTarget, self.drainLimit)
+
+        return
+
+    def wait_for_wake(self):
+        """wait_for_wake, function to wait in sleep mode for the wake up
+        interrupt, returns False if stopped first"""
+
+        accel = self.accel
+
+        while not self.stopEvent.is_set():
+            edgeTime = None
+
+            if self.edgeSource is not None:
+                edges = self.edgeSource.wait(1.0)
+                if len(edges) > 0:
+                    edgeTime = edges[-1]
+                # after a timeout check anyway, in case an edge was missed
+            else:
+                self.stopEvent.wait(self.pollInterval)
+
+            source = accel.get_int1_status()  # reading clears the latch
+
+            if source & 0b01000000:  # IA bit
+                if edgeTime is None:
+                    edgeTime = time.monotonic_ns()
+                self.wakeTime = edgeTime
+                self.wakeSource = source
+                return True
+
+        return False
+
+    def active(self, block):
+        """active, function to return True if a block of raw samples has a
+        sample above quietThreshold on the wake up axes"""
+
+        factor = self.accel.unit_factor('mg')
+
+        if LIS3DH.load_numpy() is not None:
+            data = LIS3DH.numpy.asarray(block, dtype=LIS3DH.numpy.float32).reshape(-1, 3)[:, self.axes]
+            if self.highpass == 'on':
+                # remove the slowly changing (gravity) part, roughly as the
+                # high pass filter does for the interrupt generator
+                mean = data.mean(axis=0)
+                if self.baseline is None:
+                    self.baseline = mean
+                data = data - self.baseline
+                self.baseline = mean
+            return bool(len(data) > 0 and LIS3DH.numpy.abs(data).max()*factor > self.quietThreshold)
+
+        values = list(block)
+        peak = 0.0
+
+        if self.highpass == 'on' and self.baseline is None:
+            self.baseline = [None, None, None]
+
+        for axis in self.axes:
+            axisValues = values[axis::3]
+            if len(axisValues) == 0:
+                continue
+            baseline = 0.0
+            if self.highpass == 'on':
+                mean = float(sum(axisValues))/len(axisValues)
+                if self.baseline[axis] is None:
+                    self.baseline[axis] = mean
+                baseline = self.baseline[axis]
+                self.baseline[axis] = mean
+            peak = max(peak, max([abs(value - baseline) for value in axisValues]))
+
+        return peak*factor > self.quietThreshold
+
+    def read_block(self):
+        """read_block, function to wait for the fifo watermark (or the
+        DrainScheduler delay without an edge source) and read the fifo"""
+
+        accel = self.accel
+
+        if self.edgeSource is not None:
+            self.edgeSource.wait(0.1)
+            return accel.read_fifo()
+
+        wakeTime = time.monotonic()
+        overruns = accel.dataLoss['fifoOverruns']
+        block = accel.read_fifo()
+        delay = self.scheduler.update(accel.lastFifoCount,
+                                      accel.dataLoss['fifoOverruns'] > overruns, wakeTime)
+        self.stopEvent.wait(max(0.0, wakeTime + delay - time.monotonic()))
+
+        return block
+
+    def blocks(self, units=None):
+        """blocks, generator of the blocks of samples read while active,
+        raw or converted to units (mg, g or m/s2). Between bursts of
+        activity it blocks in sleep mode. Ends when stop is called, leaving
+        the accelerometer asleep"""
+
+        self.stopEvent.clear()
+        self.sleep()
+
+        try:
+            while not self.stopEvent.is_set():
+
+                if self.state == 'sleep':
+                    if self.wait_for_wake():
+                        self.wake()
+                    continue
+
+                block = self.read_block()
+
+                if len(block) > 0:
+                    if self.active(block):
+                        self.lastActivity = time.monotonic()
+                    if units is not None:
+                        block = self.accel.convert_units(block, units)
+                    yield block
+
+                if time.monotonic() - self.lastActivity > self.quietTime:
+                    self.sleep()
+
+        finally:
+            if self.state == 'active':
+                self.sleep()
+
+        return
+
+    def stop(self):
+        """stop, function to end blocks, i.e. from another thread"""
+
+        self.stopEvent.set()
+
+        return
@@ -0,0 +1,651 @@
+#!/usr/bin/env python3
+"""LIS3DHEmulator, in memory emulation of a LIS3DH accelerometer for use
+without hardware
+
+created Oct 18, 2026"""
+
+"""
+Copyright 2020 Owain Martin
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+""" Usage:
+
+    import LIS3DH, LIS3DHEmulator
+
+    device = LIS3DHEmulator.EmulatedLIS3DH(source=LIS3DHEmulator.SineSignal(5))
+    accel = LIS3DH.Accelerometer('spi', device=LIS3DHEmulator.EmulatedSpiDev(device))
+
+or, skipping the spidev/smbus interface emulation,
+
+    accel = LIS3DH.Accelerometer(transport=LIS3DHEmulator.EmulatedTransport(device))
+
+The emulator models the register map, address auto increment, samples
+generated at the configured ODR from a signal source, the fifo modes with
+the watermark/overrun/empty flags and the STATUS_REG data ready/overrun
+bits. The interrupt 1 generator sets INT1_SRC from INT1_CFG, INT1_THS and
+INT1_DURATION (high/low events on the absolute value of each axis, OR or AND
+combination, latched with LIR_INT1); 6D detection, clicks and the high pass
+filter are not emulated. Stream-to-FIFO mode behaves like stream mode as
+there are no trigger events."""
+
+import time, math, errno
+
+# (fixed cost per transaction (s), cost per byte (s)), roughly a Pi with
+# spidev at 4MHz and smbus at 400kHz
+busTimings = {'spi': (25e-6, 2e-6), 'i2c': (150e-6, 22.5e-6)}
+
+# registers that can be written, the others are read only
+writableRegisters = (list(range(0x1E, 0x27)) + [0x2E, 0x30, 0x32, 0x33, 0x34,
+                     0x36, 0x37, 0x38] + list(range(0x3A, 0x40)))
+
+# INT1_THS LSB (mg) for the +-2g, 4g, 8g and 16g scales
+thresholdSteps = [16, 32, 62, 186]
+
+# CTRL_REG1 ODR bits to sample rate, 0b1001 is 1250Hz normal / 5000Hz low power
+odrRates = {0b0001: 1, 0b0010: 10, 0b0011: 25, 0b0100: 50, 0b0101: 100,
+            0b0110: 200, 0b0111: 400, 0b1000: 1600, 0b1001: 1250}
+
+class ConstantSignal:
+    """ConstantSignal, signal source returning the same x, y, z
+    acceleration (g) for every sample"""
+
+    def __init__(self, x=0.0, y=0.0, z=1.0):
+
+        self.value = (x, y, z)
+
+    def sample(self, index, t):
+        """sample, function to return the (x, y, z) acceleration (g) of
+        sample number index taken at time t (s)"""
+
+        return self.value
+
+class SineSignal:
+    """SineSignal, signal source returning a sine wave of freq (Hz) and
+    amplitude (g) on each axis added to a constant offset (g)"""
+
+    def __init__(self, freq=10.0, amplitude=(0.5, 0.5, 0.5), offset=(0.0, 0.0, 1.0)):
+
+        if not isinstance(amplitude, (list, tuple)):
+            amplitude = (amplitude, amplitude, amplitude)
+
+        self.freq = freq
+        self.amplitude = amplitude
+        self.offset = offset
+
+    def sample(self, index, t):
+        """sample, function to return the (x, y, z) acceleration (g) of
+        sample number index taken at time t (s)"""
+
+        s = math.sin(2*math.pi*self.freq*t)
+
+        return (self.offset[0] + self.amplitude[0]*s,
+                self.offset[1] + self.amplitude[1]*s,
+                self.offset[2] + self.amplitude[2]*s)
+
+class RecordedSignal:
+    """RecordedSignal, signal source playing back recorded x, y, z samples
+    (g), one per ODR tick. samples is a sequence of (x, y, z) or the name of
+    a text file with one comma or space separated x, y, z sample per line"""
+
+    def __init__(self, samples, loop=True):
+
+        if isinstance(samples, str):
+            fileName = samples
+            samples = []
+            with open(fileName) as f:
+                for line in f:
+                    values = line.replace(',', ' ').split()
+                    if len(values) >= 3:
+                        samples.append(tuple(float(v) for v in values[:3]))
+
+        self.samples = [tuple(sample) for sample in samples]
+        self.loop = loop
+
+    def sample(self, index, t):
+        """sample, function to return the (x, y, z) acceleration (g) of
+        sample number index taken at time t (s)"""
+
+        if self.loop:
+            index = index % len(self.samples)
+        elif index >= len(self.samples):
+            return self.samples[-1]
+
+        return self.samples[index]
+
+def bus_delay(seconds):
+    """bus_delay, function to wait for a simulated bus transaction. Short
+    delays are busy waited as time.sleep is too coarse for them. Returns
+    the time spent busy waiting (s)"""
+
+    if seconds <= 0:
+        return 0.0
+
+    if seconds > 0.002:
+        time.sleep(seconds)
+        return 0.0
+
+    endTime = time.perf_counter() + seconds
+    while time.perf_counter() < endTime:
+        pass
+
+    return seconds
+
+class EmulatedLIS3DH:
+    """EmulatedLIS3DH, register level emulation of a LIS3DH.
+
+    source - signal source with a sample(index, t) function returning the
+             (x, y, z) acceleration in g, default ConstantSignal()
+    clock - function returning the current time (s), default time.monotonic
+    latency - (fixed cost per transaction (s), cost per byte (s)) added to
+              every bus transaction, or 'spi'/'i2c' for busTimings"""
+
+    def __init__(self, source=None, clock=None, latency=None):
+
+        if source is None:
+            source = ConstantSignal()
+
+        if clock is None:
+            clock = time.monotonic
+
+        if isinstance(latency, str):
+            latency = busTimings[latency]
+
+        self.source = source
+        self.clock = clock
+        self.latency = latency
+        self.transactions = 0
+        self.bytesTransferred = 0
+        self.busyTime = 0.0  # simulated bus time spent busy waiting (s)
+        self.reset()
+
+    def reset(self):
+        """reset, function to return all registers to their power on values"""
+
+        self.regs = bytearray(0x40)
+        self.regs[0x0F] = 0x33  # WHO_AM_I
+        self.regs[0x1F] = 0x00
+        self.regs[0x20] = 0x07  # power down, x, y & z enabled
+        self.regs[0x1E] = 0x10
+
+        self.output = bytearray(6)  # OUT_X_L...OUT_Z_H when not using the fifo
+        self.fifo = []              # stored samples, 6 bytes each
+        self.outputRead = True      # latest sample has been read
+        self.fifoStopped = False    # fifo mode filled up, stopped until bypass
+        self.sampleIndex = 0        # samples generated since power on
+        self.odrStart = self.clock()
+        self.odrSamples = 0         # samples generated at the current ODR
+        self.odrSetting = None
+        self.int1Samples = 0        # samples the interrupt 1 condition has held
+
+        return
+
+    def sample_rate(self):
+        """sample_rate, function to return the current ODR (Hz) from
+        CTRL_REG1, 0 in power down mode"""
+
+        odrBits = self.regs[0x20]>>4
+        lowPowerBit = (self.regs[0x20] & 0b00001000)>>3
+
+        if odrBits == 0b1001 and lowPowerBit == 1:
+            return 5000
+
+        return odrRates.get(odrBits, 0)
+
+    def data_format(self):
+        """data_format, function to return the (sensitivity (mg/digit),
+        data shift) of the current scale, power mode and resolution"""
+
+        scaleIndex = (self.regs[0x23] & 0b00110000)>>4
+
+        if self.regs[0x20] & 0b00001000:    # LPen bit, 8 bit
+            return ([16, 32, 64, 192][scaleIndex], 8)
+        elif self.regs[0x23] & 0b00001000:  # HR bit, 12 bit
+            return ([1, 2, 4, 12][scaleIndex], 4)
+
+        return ([4, 8, 16, 48][scaleIndex], 6)
+
+    def fifo_mode(self):
+        """fifo_mode, function to return the fifo mode; bypass, fifo, stream
+        or streamfifo. bypass if the fifo is not enabled in CTRL_REG5"""
+
+        if not self.regs[0x24] & 0b01000000:  # FIFO_EN bit
+            return 'bypass'
+
+        return ['bypass', 'fifo', 'stream', 'streamfifo'][self.regs[0x2E]>>6]
+
+    def encode_sample(self, sample):
+        """encode_sample, function to convert an (x, y, z) acceleration (g)
+        to the 6 left justified output register bytes"""
+
+        sensitivity, shift = self.data_format()
+        limit = 1<<(15-shift)
+        data = bytearray(6)
+
+        for i in range(3):
+            value = int(round(sample[i]*1000.0/sensitivity))
+            value = max(-limit, min(limit-1, value))
+            value = (value<<shift) & 0xFFFF
+            data[2*i] = value & 0xFF
+            data[2*i+1] = value>>8
+
+        return data
+
+    def add_sample(self, data):
+        """add_sample, function to store a newly generated sample in the
+        output registers and the fifo"""
+
+        if not self.outputRead:
+            self.regs[0x27] |= 0xF0  # ZYXOR, ZOR, YOR, XOR
+
+        self.output[:] = data
+        self.outputRead = False
+        self.regs[0x27] |= 0x0F      # ZYXDA, ZDA, YDA, XDA
+
+        mode = self.fifo_mode()
+
+        if mode == 'bypass':
+            return
+
+        if mode == 'fifo' and self.fifoStopped:
+            return
+
+        if len(self.fifo) < 32:
+            self.fifo.append(bytes(data))
+        elif mode != 'fifo':
+            self.fifo.pop(0)         # stream modes discard the oldest
+            self.fifo.append(bytes(data))
+
+        # fifo mode stops collecting once full, reading the samples out
+        # doesn't restart it, only going through bypass mode does
+        if mode == 'fifo' and len(self.fifo) == 32:
+            self.fifoStopped = True
+
+        return
+
+    def interrupt_update(self, sample):
+        """interrupt_update, function to run the interrupt 1 generator on a
+        new (x, y, z) acceleration (g) sample and set INT1_SRC (0x31)"""
+
+        config = self.regs[0x30]
+        enabled = config & 0b00111111
+
+        if enabled == 0:
+            return
+
+        scaleIndex = (self.regs[0x23] & 0b00110000)>>4
+        threshold = (self.regs[0x32] & 0b01111111)*thresholdSteps[scaleIndex]
+        events = 0
+
+        for i in range(3):
+            if abs(sample[i]*1000.0) > threshold:
+                events |= 0b10<<(2*i)  # XH, YH, ZH
+            else:
+                events |= 0b01<<(2*i)  # XL, YL, ZL
+
+        events = events & enabled
+
+        if config & 0b10000000:  # AOI bit, AND of the enabled events
+            active = events == enabled
+        else:
+            active = events != 0
+
+        if active:
+            self.int1Samples += 1
+        else:
+            self.int1Samples = 0
+
+        # the condition has to hold for INT1_DURATION samples
+        active = self.int1Samples > (self.regs[0x33] & 0b01111111)
+
+        latched = self.regs[0x24] & 0b00001000  # LIR_INT1 bit
+
+        if active:
+            self.regs[0x31] = 0b01000000 | events  # IA bit
+        elif not latched:
+            self.regs[0x31] = events
+
+        return
+
+    def samples_left(self):
+        """samples_left, function to return how many more samples the
+        source can give, None if it doesn't run out"""
+
+        return None
+
+    def update(self):
+        """update, function to generate the samples that are due at the
+        current ODR since the last update"""
+
+        odr = self.sample_rate()
+        now = self.clock()
+
+        if odr != self.odrSetting:
+            # ODR not set through write_register (i.e. after reset),
+            # restart the sample timing
+            self.odrSetting = odr
+            self.odrStart = now
+            self.odrSamples = 0
+            return
+
+        if odr == 0:
+            return
+
+        due = int((now - self.odrStart)*odr) - self.odrSamples
+
+        left = self.samples_left()
+        if left is not None:
+            due = min(due, left)
+
+        if due <= 0:
+            return
+
+        # only the last 32 samples can still be in the fifo, apart from
+        # fifo mode, which keeps the first ones until it is full
+        first = 0
+        if self.fifo_mode() == 'fifo' and not self.fifoStopped:
+            first = min(due, 32 - len(self.fifo))
+        skipped = max(0, due - first - 33)
+
+        for i in range(due - skipped):
+            if i == first and skipped > 0:
+                self.sampleIndex += skipped
+                self.odrSamples += skipped
+                self.outputRead = False
+            t = self.odrStart + float(self.odrSamples)/odr
+            sample = self.source.sample(self.sampleIndex, t)
+            self.add_sample(self.encode_sample(sample))
+            self.interrupt_update(sample)
+            self.sampleIndex += 1
+            self.odrSamples += 1
+
+        return
+
+    def fifo_source(self):
+        """fifo_source, function to return the FIFO_SRC_REG (0x2F) value"""
+
+        count = len(self.fifo)
+        value = min(count, 31)              # FSS bits
+
+        if count > (self.regs[0x2E] & 0b00011111):
+            value |= 0b10000000             # WTM bit
+        if count == 32:
+            value |= 0b01000000             # OVRN_FIFO bit, all 32 levels full
+        if count == 0:
+            value |= 0b00100000             # EMPTY bit
+
+        return value
+
+    def read_register(self, reg):
+        """read_register, function to read one register, including the
+        side effects of reading the status and output registers"""
+
+        if reg == 0x27:
+            return self.regs[0x27]
+
+        if reg == 0x2F:
+            return self.fifo_source()
+
+        if reg == 0x31:
+            value = self.regs[0x31]
+            if self.regs[0x24] & 0b00001000:  # LIR_INT1, reading clears the latch
+                self.regs[0x31] = 0
+            return value
+
+        if 0x28 <= reg <= 0x2D:
+            useFifo = self.fifo_mode() != 'bypass' and len(self.fifo) > 0
+
+            if useFifo:
+                value = self.fifo[0][reg-0x28]
+            else:
+                value = self.output[reg-0x28]
+
+            if reg == 0x2D:  # OUT_Z_H completes the sample
+                if useFifo:
+                    self.fifo.pop(0)
+                self.outputRead = True
+                self.regs[0x27] = 0x00
+
+            return value
+
+        return self.regs[reg]
+
+    def write_register(self, reg, value):
+        """write_register, function to write one register, writes to read
+        only registers are ignored"""
+
+        if reg not in writableRegisters:
+            return
+
+        if reg == 0x24 and value & 0b10000000:  # BOOT bit, reload defaults
+            self.reset()
+            return
+
+        self.regs[reg] = value & 0xFF
+
+        if reg == 0x20 and self.sample_rate() != self.odrSetting:
+            # samples at the new ODR are timed from this write, the ones
+            # due at the old ODR were made by the update before it
+            self.odrSetting = self.sample_rate()
+            self.odrStart = self.clock()
+            self.odrSamples = 0
+
+        if reg == 0x2E and (value>>6) == 0b00:  # bypass mode empties the fifo
+            self.fifo = []
+            self.fifoStopped = False
+
+        return
+
+    def next_register(self, reg):
+        """next_register, function to return the address after reg when auto
+        incrementing, the output registers roll back to OUT_X_L (0x28) after
+        OUT_Z_H (0x2D) while the fifo is enabled"""
+
+        if reg == 0x2D and self.fifo_mode() != 'bypass':
+            return 0x28
+
+        return (reg + 1) & 0x3F
+
+    def transaction(self, count):
+        """transaction, function to count a bus transaction of count bytes
+        and apply the simulated bus latency"""
+
+        self.transactions += 1
+        self.bytesTransferred += count
+
+        if self.latency is not None:
+            self.busyTime += bus_delay(self.latency[0] + self.latency[1]*count)
+
+        return
+
+    def read(self, reg, count=1, autoIncrement=True):
+        """read, function to read count registers starting at reg in one
+        transaction. Returns a list of values"""
+
+        values = bytearray(count)
+        self.read_into(reg, values, autoIncrement)
+
+        return list(values)
+
+    def read_into(self, reg, buf, autoIncrement=True):
+        """read_into, function to read len(buf) registers starting at reg
+        in one transaction into buf (a bytearray or memoryview)"""
+
+        self.transaction(len(buf) + 1)
+        self.update()
+
+        reg = reg & 0x3F
+
+        for i in range(len(buf)):
+            buf[i] = self.read_register(reg)
+            if autoIncrement:
+                reg = self.next_register(reg)
+
+        return
+
+    def write(self, reg, values, autoIncrement=True):
+        """write, function to write values to registers starting at reg in
+        one transaction"""
+
+        self.transaction(len(values) + 1)
+        self.update()
+
+        reg = reg & 0x3F
+
+        for value in values:
+            self.write_register(reg, value)
+            if autoIncrement:
+                reg = (reg + 1) & 0x3F
+
+        return
+
+class EmulatedTransport:
+    """EmulatedTransport, LIS3DH transport (see LIS3DH.SpiTransport) giving
+    direct register access to an EmulatedLIS3DH, without going through the
+    spidev or smbus interfaces. mode (spi or i2c) sets maxBlock"""
+
+    def __init__(self, device, mode='spi'):
+
+        self.device = device
+        self.mode = mode
+        self.maxBlock = 4095 if mode == 'spi' else 32
+        self.busKey = ('emulator', id(device))
+
+    def read_byte(self, reg):
+        """read_byte, function to read a single register"""
+
+        return self.device.read(reg, 1)[0]
+
+    def write_byte(self, reg, value):
+        """write_byte, function to write a single register"""
+
+        self.device.write(reg, [value])
+
+        return
+
+    def read(self, reg, count=1):
+        """read, function to read count consecutive registers"""
+
+        return self.device.read(reg, count)
+
+    def read_into(self, reg, buf):
+        """read_into, function to read len(buf) consecutive registers into
+        buf"""
+
+        self.device.read_into(reg, buf)
+
+        return
+
+    def write(self, reg, values):
+        """write, function to write consecutive registers"""
+
+        self.device.write(reg, list(values))
+
+        return
+
+    def close(self):
+        """close, function matching the transport interface, does nothing"""
+
+        return
+
+class EmulatedSpiDev:
+    """EmulatedSpiDev, spidev.SpiDev interface to an EmulatedLIS3DH"""
+
+    def __init__(self, device):
+
+        self.device = device
+        self.max_speed_hz = 4000000
+        self.mode = 0
+
+    def open(self, port, cs):
+        """open, function matching spidev.SpiDev.open, does nothing"""
+
+        return
+
+    def close(self):
+        """close, function matching spidev.SpiDev.close, does nothing"""
+
+        return
+
+    def xfer2(self, data):
+        """xfer2, function to perform a full duplex transfer. The first byte
+        holds the read/write bit (7), the auto increment bit (6) and the
+        register address"""
+
+        command = data[0]
+        reg = command & 0x3F
+        autoIncrement = (command & 0b01000000) != 0
+
+        if command & 0b10000000:  # read
+            return [0] + self.device.read(reg, len(data)-1, autoIncrement)
+
+        self.device.write(reg, list(data[1:]), autoIncrement)
+
+        return [0]*len(data)
+
+class EmulatedSMBus:
+    """EmulatedSMBus, smbus.SMBus interface to an EmulatedLIS3DH at i2c
+    address"""
+
+    def __init__(self, device, address=0x19):
+
+        self.device = device
+        self.address = address
+
+    def check_address(self, addr):
+        """check_address, function to raise the error smbus gives when no
+        device acknowledges addr"""
+
+        if addr != self.address:
+            raise IOError(errno.EREMOTEIO, 'Remote I/O error')
+
+        return
+
+    def close(self):
+        """close, function matching smbus.SMBus.close, does nothing"""
+
+        return
+
+    def read_byte_data(self, addr, reg):
+        """read_byte_data, function to read one register"""
+
+        self.check_address(addr)
+
+        return self.device.read(reg & 0x7F, 1, False)[0]
+
+    def write_byte_data(self, addr, reg, value):
+        """write_byte_data, function to write one register"""
+
+        self.check_address(addr)
+        self.device.write(reg & 0x7F, [value], False)
+
+        return
+
+    def read_i2c_block_data(self, addr, reg, length=32):
+        """read_i2c_block_data, function to read up to 32 registers, the MSb
+        of the sub-address (reg) enables auto increment"""
+
+        self.check_address(addr)
+
+        return self.device.read(reg & 0x7F, min(length, 32), (reg & 0x80) != 0)
+
+    def write_i2c_block_data(self, addr, reg, values):
+        """write_i2c_block_data, function to write up to 32 registers, the
+        MSb of the sub-address (reg) enables auto increment"""
+
+        self.check_address(addr)
+        self.device.write(reg & 0x7F, list(values)[:32], (reg & 0x80) != 0)
+
+        return
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""LIS3DHGpio, interrupt pin edge sources using the Linux GPIO character
+device, for use with Accelerometer.start_stream(edgeSource=...)
+
+created Oct 18, 2026"""
+
+"""
+Copyright 2020 Owain Martin
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+""" Usage:
+
+    import LIS3DH, LIS3DHGpio
+
+    accel = LIS3DH.Accelerometer('spi', spiPort = 0, spiCS = 1)
+    accel.set_ODR(odr=400)
+    accel.set_int1_pin(drdy1=1)
+    edges = LIS3DHGpio.GpioEdgeSource('/dev/gpiochip0', 17)   # INT1 on BCM 17
+    accel.start_stream(edgeSource=edges)
+
+The edge source waits for the interrupt line in the kernel (poll on a line
+event file descriptor), so no CPU is used between interrupts, and every
+event carries the kernel's timestamp of the edge. An edge source has
+fileno() (for select/asyncio), wait(timeout) returning the event
+timestamps (ns) and close(). PipeEdgeSource is a fake driven from Python
+for testing without a gpio line."""
+
+import os, struct, select, time
+
+# linux/gpio.h, v1 line event interface
+GPIOHANDLE_REQUEST_INPUT = 0x01
+GPIOEVENT_REQUEST_RISING_EDGE = 0x01
+GPIOEVENT_REQUEST_FALLING_EDGE = 0x02
+GPIOEVENT_EVENT_RISING_EDGE = 0x01
+GPIOEVENT_EVENT_FALLING_EDGE = 0x02
+# _IOWR(0xB4, 0x04, struct gpioevent_request), the request being 48 bytes
+GPIO_GET_LINEEVENT_IOCTL = 0xC030B404
+
+eventRequestFormat = '<III32si'  # lineoffset, handleflags, eventflags, consumer_label, fd
+eventDataFormat = '<QI4x'        # timestamp (ns), id, padding
+eventDataSize = struct.calcsize(eventDataFormat)
+
+class EdgeSource:
+    """EdgeSource, base class reading gpioevent_data records from a file
+    descriptor"""
+
+    def __init__(self, fd):
+
+        self.fd = fd
+        self.poller = select.poll()
+        self.poller.register(fd, select.POLLIN | select.POLLPRI)
+        self.lastTimestamp = None
+
+    def fileno(self):
+        """fileno, function to return the event file descriptor"""
+
+        return self.fd
+
+    def read_events(self):
+        """read_events, function to read all the pending events and return
+        [(timestamp (ns), id), ...]"""
+
+        data = os.read(self.fd, eventDataSize*64)
+        events = []
+
+        for i in range(0, len(data) - eventDataSize + 1, eventDataSize):
+            events.append(struct.unpack_from(eventDataFormat, data, i))
+
+        return events
+
+    def wait(self, timeout=None):
+        """wait, function to wait for the next edges. Returns the timestamps
+        (ns) of the events, an empty list if the timeout (s) expires first"""
+
+        if timeout is not None:
+            timeout = int(timeout*1000)
+
+        if not self.poller.poll(timeout):
+            return []
+
+        timestamps = [timestamp for timestamp, eventId in self.read_events()]
+
+        if len(timestamps) > 0:
+            self.lastTimestamp = timestamps[-1]
+
+        return timestamps
+
+    def close(self):
+        """close, function to close the event file descriptor"""
+
+        if self.fd is not None:
+            self.poller.unregister(self.fd)
+            os.close(self.fd)
+            self.fd = None
+
+        return
+
+class GpioEdgeSource(EdgeSource):
+    """GpioEdgeSource, edges of a gpio line read through the GPIO character
+    device /dev/gpiochip<n>.
+
+    edge - rising, falling or both, use rising with
+           interrupt_high_low('high') and falling with ('low')
+
+    The kernel timestamps are CLOCK_MONOTONIC (time.monotonic_ns) on Linux
+    5.7 and later, CLOCK_REALTIME on older kernels"""
+
+    def __init__(self, chip='/dev/gpiochip0', line=0, edge='rising',
+                 consumer='LIS3DH'):
+
+        import fcntl
+
+        eventFlags = GPIOEVENT_REQUEST_RISING_EDGE
+        if edge == 'falling':
+            eventFlags = GPIOEVENT_REQUEST_FALLING_EDGE
+        elif edge == 'both':
+            eventFlags = GPIOEVENT_REQUEST_RISING_EDGE | GPIOEVENT_REQUEST_FALLING_EDGE
+
+        request = bytearray(struct.pack(eventRequestFormat, line,
+                                        GPIOHANDLE_REQUEST_INPUT, eventFlags,
+                                        consumer.encode()[:31], 0))
+
+        chipFd = os.open(chip, os.O_RDONLY)
+        try:
+            fcntl.ioctl(chipFd, GPIO_GET_LINEEVENT_IOCTL, request, True)
+        finally:
+            os.close(chipFd)
+
+        EdgeSource.__init__(self, struct.unpack(eventRequestFormat, bytes(request))[4])
+
+class PipeEdgeSource(EdgeSource):
+    """PipeEdgeSource, edge source fed through a pipe with trigger, for
+    testing without a gpio line. It can be driven from another thread, or
+    from an emulated device"""
+
+    def __init__(self):
+
+        readFd, self.writeFd = os.pipe()
+        EdgeSource.__init__(self, readFd)
+
+    def trigger(self, timestamp=None, rising=True):
+        """trigger, function to add an edge event, timestamped now
+        (time.monotonic_ns) unless a timestamp (ns) is given"""
+
+        if timestamp is None:
+            timestamp = time.monotonic_ns()
+
+        if rising:
+            eventId = GPIOEVENT_EVENT_RISING_EDGE
+        else:
+            eventId = GPIOEVENT_EVENT_FALLING_EDGE
+
+        os.write(self.writeFd, struct.pack(eventDataFormat, timestamp, eventId))
+
+        return
+
+    def close(self):
+        """close, function to close both ends of the pipe"""
+
+        EdgeSource.close(self)
+
+        if self.writeFd is not None:
+            os.close(self.writeFd)
+            self.writeFd = None
+
+        return
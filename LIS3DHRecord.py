@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""LIS3DHRecord, compact binary recording of LIS3DH samples and a memory
+mapped reader for the recordings
+
+created Oct 18, 2026"""
+
+"""
+Copyright 2020 Owain Martin
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+""" Usage:
+
+    import LIS3DH, LIS3DHRecord
+
+    accel = LIS3DH.Accelerometer('spi', spiPort = 0, spiCS = 1)
+    ... set_ODR, set_fifo_mode('stream') etc
+    recorder = LIS3DHRecord.Recorder('capture.lis', accel)
+
+    while recording:
+        recorder.write(accel.read_fifo())
+
+    recorder.close()
+
+    capture = LIS3DHRecord.CaptureReader('capture.lis')
+    for i in range(len(capture)):
+        info = capture.block_info(i)     # startTime, odr, scale, ...
+        block = capture.block(i)         # (count, 3) int16 view of the file
+    xyz = capture.samples(1000000, 1001000)
+
+File format, little endian
+- file header, 24 bytes: magic b'LIS3DHRC', version (u32), 12 reserved bytes
+- blocks, each a 24 byte header followed by count x, y, z int16 triples
+  header: magic b'BLK1', startTime (i64, ns), odr (u32), scale (u8),
+          powerMode (u8, see powerModes), resolution (u8, see resolutions),
+          1 reserved byte, count (u32)
+
+The samples are the right justified values returned by read_fifo and
+read_xyz, convert them with LIS3DH.sensitivityTable or convert_units. The
+headers are a multiple of 6 bytes long, so the samples of every block stay
+aligned as int16 triples. A block cut short by a crash while recording is
+ignored by the reader."""
+
+import os, sys, struct, mmap, time, array
+
+import LIS3DH
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+fileMagic = b'LIS3DHRC'
+fileVersion = 1
+fileHeaderFormat = '<8sI12x'
+fileHeaderSize = struct.calcsize(fileHeaderFormat)
+
+blockMagic = b'BLK1'
+blockHeaderFormat = '<4sqIBBBxI'
+blockHeaderSize = struct.calcsize(blockHeaderFormat)
+
+powerModes = ['normal', 'low', 'off']
+resolutions = ['low', 'high']
+
+class Recorder:
+    """Recorder, writes blocks of samples to a capture file. The block
+    settings (ODR, scale, power mode, resolution) are taken from accel when
+    each block is written, or set with set_format if there is no
+    Accelerometer. append adds blocks to an existing capture file"""
+
+    def __init__(self, fileName, accel=None, append=False):
+
+        self.accel = accel
+        self.odr = 50
+        self.scale = 2
+        self.powerMode = 'normal'
+        self.resolution = 'low'
+        self.blocks = 0
+        self.samples = 0
+
+        if append and os.path.exists(fileName) and os.path.getsize(fileName) > 0:
+            self.f = open(fileName, 'ab')
+        else:
+            self.f = open(fileName, 'wb')
+            self.f.write(struct.pack(fileHeaderFormat, fileMagic, fileVersion))
+
+    def set_format(self, odr=50, scale=2, powerMode='normal', resolution='low'):
+        """set_format, function to set the block settings used when there is
+        no Accelerometer"""
+
+        self.odr = odr
+        self.scale = scale
+        self.powerMode = powerMode
+        self.resolution = resolution
+
+        return
+
+    def write(self, samples, startTime=None):
+        """write, function to write a block of samples, as returned by
+        read_fifo (an (n, 3) numpy array or a flat array of x, y, z values)
+        or a list of read_xyz tuples. startTime (ns) defaults to the time
+        now (time.time_ns). Returns the number of samples written"""
+
+        if startTime is None:
+            startTime = time.time_ns()
+
+        if self.accel is not None:
+            self.set_format(self.accel.odr, self.accel.scale,
+                            self.accel.powerMode, self.accel.resolution)
+
+        if numpy is not None:
+            data = numpy.ascontiguousarray(samples, dtype='<i2')
+            count = data.size//3
+        else:
+            data = array.array('h')
+            for value in samples:
+                if isinstance(value, tuple):
+                    data.extend(value)
+                else:
+                    data.append(value)
+            if sys.byteorder == 'big':
+                data.byteswap()
+            count = len(data)//3
+
+        if count == 0:
+            return 0
+
+        self.f.write(struct.pack(blockHeaderFormat, blockMagic, int(startTime),
+                                 int(self.odr), self.scale,
+                                 powerModes.index(self.powerMode),
+                                 resolutions.index(self.resolution), count))
+        self.f.write(data)
+
+        self.blocks += 1
+        self.samples += count
+
+        return count
+
+    def flush(self):
+        """flush, function to push the written blocks to the file"""
+
+        self.f.flush()
+
+        return
+
+    def close(self):
+        """close, function to close the capture file"""
+
+        if self.f is not None:
+            self.f.close()
+            self.f = None
+
+        return
+
+    def __enter__(self):
+
+        return self
+
+    def __exit__(self, *args):
+
+        self.close()
+
+        return
+
+class CaptureReader:
+    """CaptureReader, memory maps a capture file written by Recorder. Blocks
+    are returned as views of the mapped file, so captures larger than memory
+    can be sliced without reading them in. The views are numpy (count, 3)
+    int16 arrays, or flat memoryviews of int16 values without numpy"""
+
+    def __init__(self, fileName):
+
+        self.f = open(fileName, 'rb')
+        self.size = os.fstat(self.f.fileno()).st_size
+        self.map = None
+        self.index = []   # (data offset, startTime, odr, scale, powerMode, resolution, count)
+        self.starts = []  # first sample number of each block
+        self.sampleCount = 0
+
+        if self.size < fileHeaderSize:
+            raise ValueError('not an LIS3DH capture file')
+
+        self.map = mmap.mmap(self.f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version = struct.unpack_from(fileHeaderFormat, self.map, 0)
+
+        if magic != fileMagic or version > fileVersion:
+            raise ValueError('not an LIS3DH capture file, or a newer version')
+
+        self.scan()
+
+    def scan(self):
+        """scan, function to index the block headers"""
+
+        offset = fileHeaderSize
+
+        while offset + blockHeaderSize <= self.size:
+            (magic, startTime, odr, scale, powerMode, resolution,
+             count) = struct.unpack_from(blockHeaderFormat, self.map, offset)
+
+            dataOffset = offset + blockHeaderSize
+
+            if magic != blockMagic or dataOffset + count*6 > self.size:
+                break  # damaged or cut short
+
+            self.index.append((dataOffset, startTime, odr, scale,
+                               powerModes[powerMode], resolutions[resolution], count))
+            self.starts.append(self.sampleCount)
+            self.sampleCount += count
+            offset = dataOffset + count*6
+
+        return
+
+    def __len__(self):
+
+        return len(self.index)
+
+    def block_info(self, i):
+        """block_info, function to return the settings of block i as a dict;
+        startTime (ns), odr, scale, powerMode, resolution, count and
+        sensitivity (mg/digit)"""
+
+        dataOffset, startTime, odr, scale, powerMode, resolution, count = self.index[i]
+
+        return {'startTime': startTime, 'odr': odr, 'scale': scale,
+                'powerMode': powerMode, 'resolution': resolution, 'count': count,
+                'sensitivity': sensitivity(scale, powerMode, resolution)}
+
+    def view(self, offset, count):
+        """view, function to return count samples at a file offset as a view
+        of the mapped file"""
+
+        if numpy is not None:
+            return numpy.frombuffer(self.map, dtype='<i2', count=count*3,
+                                    offset=offset).reshape(-1, 3)
+
+        return memoryview(self.map)[offset:offset + count*6].cast('h')
+
+    def block(self, i):
+        """block, function to return the samples of block i as a view"""
+
+        dataOffset, startTime, odr, scale, powerMode, resolution, count = self.index[i]
+
+        return self.view(dataOffset, count)
+
+    def blocks(self):
+        """blocks, generator of (block_info, samples view) for every block"""
+
+        for i in range(len(self.index)):
+            yield self.block_info(i), self.block(i)
+
+        return
+
+    def find_block(self, sample):
+        """find_block, function to return the block holding sample number
+        sample, counted across the whole file"""
+
+        low = 0
+        high = len(self.starts)
+
+        while high - low > 1:
+            middle = (low + high)//2
+            if self.starts[middle] <= sample:
+                low = middle
+            else:
+                high = middle
+
+        return low
+
+    def samples(self, start=0, stop=None):
+        """samples, function to return samples start to stop, counted across
+        the whole file. A range within one block is a view of the file, a
+        range spanning blocks is copied (only the samples asked for)"""
+
+        if stop is None or stop > self.sampleCount:
+            stop = self.sampleCount
+
+        start = max(0, min(start, stop))
+
+        if start == stop:
+            if numpy is not None:
+                return numpy.zeros((0, 3), dtype='<i2')
+            return memoryview(array.array('h'))
+
+        parts = []
+        i = self.find_block(start)
+
+        while start < stop:
+            dataOffset, count = self.index[i][0], self.index[i][6]
+            first = start - self.starts[i]
+            last = min(count, stop - self.starts[i])
+            parts.append(self.view(dataOffset + first*6, last - first))
+            start = self.starts[i] + last
+            i += 1
+
+        if len(parts) == 1:
+            return parts[0]
+
+        if numpy is not None:
+            return numpy.concatenate(parts)
+
+        data = array.array('h')
+        for part in parts:
+            data.extend(part)
+
+        return memoryview(data)
+
+    def close(self):
+        """close, function to unmap and close the capture file. Views still
+        in use keep the mapping open until they are released"""
+
+        if self.map is not None:
+            try:
+                self.map.close()
+            except BufferError:
+                pass  # views still exported
+            self.map = None
+
+        if self.f is not None:
+            self.f.close()
+            self.f = None
+
+        return
+
+    def __enter__(self):
+
+        return self
+
+    def __exit__(self, *args):
+
+        self.close()
+
+        return
+
+def sensitivity(scale=2, powerMode='normal', resolution='low'):
+    """sensitivity, function to return the mg/digit of recorded samples"""
+
+    return LIS3DH.sensitivityTable[(scale, LIS3DH.data_shift(powerMode, resolution))]
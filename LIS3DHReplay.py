@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""LIS3DHReplay, transport playing a recorded capture (see LIS3DHRecord)
+back through the Accelerometer functions
+
+created Oct 18, 2026"""
+
+"""
+Copyright 2020 Owain Martin
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+""" Usage:
+
+    import LIS3DH, LIS3DHReplay
+
+    replay = LIS3DHReplay.ReplayTransport('capture.lis', speed=None)
+    accel = LIS3DH.Accelerometer(transport=replay)
+    replay.apply_format(accel)   # ODR, scale and resolution of the capture
+    accel.set_fifo_mode('stream')
+
+    while not replay.finished():
+        block = accel.read_fifo()
+
+The capture is played through an EmulatedLIS3DH, so the register map,
+STATUS_REG, FIFO_SRC_REG and INT1_SRC behave as in LIS3DHEmulator, with the
+recorded samples coming out one per ODR tick.
+
+speed - 1.0 plays back in real time, other values scale the time (2.0 is
+        twice as fast), None plays back as fast as possible; time only moves
+        on when the reader looks for new data (reads STATUS_REG, FIFO_SRC_REG
+        or output registers it has already read), so hours of data can be
+        run through in seconds"""
+
+import time
+
+import LIS3DHEmulator, LIS3DHRecord
+
+class PlaybackClock:
+    """PlaybackClock, emulator clock running at speed times real time, or
+    moved by advance_to only if speed is None"""
+
+    def __init__(self, speed=1.0):
+
+        self.speed = speed
+        self.start = time.monotonic()
+        self.now = 0.0
+
+    def __call__(self):
+
+        if self.speed is None:
+            return self.now
+
+        return (time.monotonic() - self.start)*self.speed
+
+    def advance_to(self, t):
+        """advance_to, function to move a manual clock forward to t (s)"""
+
+        self.now = max(self.now, t)
+
+        return
+
+class CaptureSignal:
+    """CaptureSignal, emulator signal source giving the samples of a
+    CaptureReader in g, one per ODR tick. With loop the capture starts
+    again at the end"""
+
+    def __init__(self, capture, loop=False):
+
+        self.capture = capture
+        self.loop = loop
+        self.count = capture.sampleCount
+        self.blockIndex = -1
+        self.blockStart = 0
+        self.blockEnd = 0
+        self.block = None
+        self.factor = 0.001
+
+    def load_block(self, index):
+        """load_block, function to make the block holding sample index the
+        current block"""
+
+        self.blockIndex = self.capture.find_block(index)
+        info = self.capture.block_info(self.blockIndex)
+        self.blockStart = self.capture.starts[self.blockIndex]
+        self.blockEnd = self.blockStart + info['count']
+        self.block = self.capture.block(self.blockIndex)
+        self.factor = info['sensitivity']*0.001  # raw to g
+
+        return
+
+    def sample(self, index, t):
+        """sample, function to return the (x, y, z) acceleration (g) of
+        sample number index taken at time t (s)"""
+
+        if self.loop:
+            index = index % self.count
+        else:
+            index = min(index, self.count - 1)
+
+        if not self.blockStart <= index < self.blockEnd:
+            self.load_block(index)
+
+        i = index - self.blockStart
+
+        if LIS3DHRecord.numpy is not None:
+            x, y, z = self.block[i]
+        else:
+            x, y, z = self.block[3*i], self.block[3*i+1], self.block[3*i+2]
+
+        return (x*self.factor, y*self.factor, z*self.factor)
+
+class ReplayLIS3DH(LIS3DHEmulator.EmulatedLIS3DH):
+    """ReplayLIS3DH, EmulatedLIS3DH that stops when the capture runs out
+    and, with a manual PlaybackClock, generates samples on demand"""
+
+    def reset(self):
+        """reset, function to return all registers to their power on values"""
+
+        self.outputMask = 0b111111  # output registers read since the last sample
+
+        LIS3DHEmulator.EmulatedLIS3DH.reset(self)
+
+        return
+
+    def add_sample(self, data):
+        """add_sample, function to store a newly generated sample, noting
+        that none of its output registers have been read"""
+
+        self.outputMask = 0
+
+        LIS3DHEmulator.EmulatedLIS3DH.add_sample(self, data)
+
+        return
+
+    def samples_left(self):
+        """samples_left, function to return how many capture samples are
+        still to be played, None if looping"""
+
+        if self.source.loop:
+            return None
+
+        return self.source.count - self.sampleIndex
+
+    def advance(self, count):
+        """advance, function to move a manual clock on by count samples of
+        the current ODR and generate them"""
+
+        odr = self.sample_rate()
+
+        if self.clock.speed is not None or odr == 0 or odr != self.odrSetting:
+            return
+
+        self.clock.advance_to(self.odrStart + (self.odrSamples + count + 0.5)/odr)
+        self.update()
+
+        return
+
+    def read_register(self, reg):
+        """read_register, function to read one register, first generating
+        the samples the reader is looking for when playing back as fast as
+        possible"""
+
+        if self.clock.speed is None:
+            mode = self.fifo_mode()
+
+            if reg == 0x27 and not self.regs[0x27] & 0b00001000:  # ZYXDA bit
+                self.advance(1)
+
+            elif reg == 0x2F and mode != 'bypass':
+                # fill the fifo past the watermark, or all 32 levels
+                target = (self.regs[0x2E] & 0b00011111) + 1
+                if target == 1:
+                    target = 32
+                if len(self.fifo) < target:
+                    self.advance(target - len(self.fifo))
+
+            elif 0x28 <= reg <= 0x2D and mode == 'bypass':
+                # an output register already read since the last sample
+                if self.outputMask & (1<<(reg - 0x28)):
+                    self.advance(1)
+                self.outputMask |= 1<<(reg - 0x28)
+
+        return LIS3DHEmulator.EmulatedLIS3DH.read_register(self, reg)
+
+class ReplayTransport(LIS3DHEmulator.EmulatedTransport):
+    """ReplayTransport, Accelerometer transport serving a capture file (or
+    CaptureReader) through a ReplayLIS3DH.
+
+    speed - playback speed, 1.0 real time, None as fast as possible
+    loop - start the capture again at the end
+    latency - simulated bus latency, see LIS3DHEmulator.EmulatedLIS3DH"""
+
+    def __init__(self, capture, speed=1.0, mode='spi', loop=False, latency=None):
+
+        if not isinstance(capture, LIS3DHRecord.CaptureReader):
+            capture = LIS3DHRecord.CaptureReader(capture)
+
+        if capture.sampleCount == 0:
+            raise ValueError('capture has no samples')
+
+        self.capture = capture
+        self.clock = PlaybackClock(speed)
+        device = ReplayLIS3DH(CaptureSignal(capture, loop), self.clock, latency)
+
+        LIS3DHEmulator.EmulatedTransport.__init__(self, device, mode)
+
+    def apply_format(self, accel):
+        """apply_format, function to set an Accelerometer's ODR, power
+        mode, scale and resolution to those of the first capture block"""
+
+        info = self.capture.block_info(0)
+
+        accel.set_ODR(odr=info['odr'], powerMode=info['powerMode'])
+        accel.set_scale(info['scale'])
+        accel.set_resolution(info['resolution'])
+
+        return
+
+    def position(self):
+        """position, function to return the number of capture samples
+        played so far"""
+
+        return self.device.sampleIndex
+
+    def finished(self):
+        """finished, function to return True once every capture sample has
+        been played and read"""
+
+        device = self.device
+
+        return (device.samples_left() == 0 and device.outputRead and
+                len(device.fifo) == 0)
+
+    def close(self):
+        """close, function to close the capture file"""
+
+        self.capture.close()
+
+        return
@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""LIS3DHRules, host side evaluation of many interrupt and click rules at
+once over blocks of LIS3DH samples
+
+created Oct 18, 2026"""
+
+"""
+Copyright 2020 Owain Martin
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+""" Usage:
+
+    import LIS3DH, LIS3DHRules
+
+    accel = LIS3DH.Accelerometer('spi', spiPort = 0, spiCS = 1)
+    ... set_ODR(odr=400), set_fifo_mode('stream')
+
+    engine = LIS3DHRules.RuleEngine(rate=400)
+    engine.add(LIS3DHRules.InterruptRule('bump', threshold=1500, duration=10,
+                                         aoi=0, xh=1, yh=1, zh=1))
+    engine.add(LIS3DHRules.InterruptRule('freefall', threshold=350, duration=30,
+                                         aoi=1, xl=1, yl=1, zl=1))
+    engine.add(LIS3DHRules.ClickRule('tap', threshold=1200, timeLimit=20,
+                                     timeLatency=50, timeWindow=200, zd=1))
+
+    while True:
+        samples, times = accel.read_fifo(units='mg', timestamps=True)
+        for event in engine.process(samples, times):
+            print(event['rule'], event['time'], bin(event['source']))
+
+The rules take the same settings as set_int1_config/set_int1_threshold/
+set_int1_duration and set_click_config/set_click_threshold/
+set_click_time*, thresholds in mg and durations in ms. Each block is
+compared with every rule at once with numpy, so adding rules costs little
+and needs no bus access. Events are dicts; rule, sample (number counted
+since the engine started), time (ns) and source, laid out like INT1_SRC
+(0x31) or CLICK_SRC (0x39).
+
+Interrupt rules compare the absolute value of each axis with the threshold,
+or with d6=1 the signed value (XH above +threshold, XL below -threshold);
+aoi=1, d6=1 is 6D position (an enabled direction is held) and aoi=0, d6=1
+6D movement (the direction changes to an enabled one). numpy is required."""
+
+import numpy
+
+class InterruptRule:
+    """InterruptRule, a virtual interrupt generator; threshold (mg),
+    duration (ms) and the set_int1_config options"""
+
+    def __init__(self, name, threshold=1000, duration=0, aoi=1, d6=0,
+                 zh=0, zl=0, yh=0, yl=0, xh=0, xl=0):
+
+        self.name = name
+        self.threshold = abs(threshold)
+        self.duration = abs(duration)
+        self.config = ((aoi<<7) + (d6<<6) + (zh<<5) + (zl<<4) + (yh<<3) +
+                       (yl<<2) + (xh<<1) + xl)
+
+class ClickRule:
+    """ClickRule, a virtual click detector; threshold (mg), timeLimit,
+    timeLatency and timeWindow (ms) and the set_click_config options"""
+
+    def __init__(self, name, threshold=1000, timeLimit=10, timeLatency=0,
+                 timeWindow=0, zd=0, zs=1, yd=0, ys=0, xd=0, xs=0):
+
+        self.name = name
+        self.threshold = abs(threshold)
+        self.timeLimit = abs(timeLimit)
+        self.timeLatency = abs(timeLatency)
+        self.timeWindow = abs(timeWindow)
+        self.config = ((zd<<5) + (zs<<4) + (yd<<3) + (ys<<2) + (xd<<1) + xs)
+
+def axis_bits(high, low):
+    """axis_bits, function to combine (n, 3, rules) high and low event
+    arrays into (n, rules) INT1_SRC style bits; XL, XH, YL, YH, ZL, ZH"""
+
+    bits = numpy.zeros(high.shape[0:1] + high.shape[2:], dtype=numpy.int64)
+
+    for axis in range(3):
+        bits |= low[:, axis].astype(numpy.int64)<<(2*axis)
+        bits |= high[:, axis].astype(numpy.int64)<<(2*axis + 1)
+
+    return bits
+
+class RuleEngine:
+    """RuleEngine, evaluates InterruptRules and ClickRules over blocks of
+    samples at rate (Hz).
+
+    factor - mg per unit of the blocks; 1.0 for units='mg', 1000.0 for
+             units='g' or accel.unit_factor('mg') for raw blocks
+    startTime - time (ns) of the first sample, used for the event times
+                if process isn't given timestamps"""
+
+    def __init__(self, rate=50, factor=1.0, startTime=None):
+
+        self.rate = rate
+        self.factor = factor
+        self.startTime = startTime
+        self.interruptRules = []
+        self.clickRules = []
+        self.reset()
+
+    def add(self, rule):
+        """add, function to add an InterruptRule or ClickRule"""
+
+        if isinstance(rule, ClickRule):
+            self.clickRules.append(rule)
+        else:
+            self.interruptRules.append(rule)
+
+        self.reset()
+
+        return
+
+    def samples(self, duration, limit):
+        """samples, function to convert a duration (ms) to samples, as the
+        set_ duration functions do"""
+
+        return min(limit, int((float(duration)/1000)*self.rate))
+
+    def reset(self):
+        """reset, function to work out the rule arrays and clear the rule
+        state, i.e. after adding rules or a gap in the samples"""
+
+        self.sampleCount = 0
+
+        rules = self.interruptRules
+        self.thresholds = numpy.array([rule.threshold for rule in rules], dtype=numpy.float64)
+        self.durations = numpy.array([self.samples(rule.duration, 127) for rule in rules],
+                                     dtype=numpy.int64)
+        self.enabled = numpy.array([rule.config & 0b00111111 for rule in rules], dtype=numpy.int64)
+        self.aoi = numpy.array([(rule.config>>7) & 1 for rule in rules], dtype=bool)
+        self.d6 = numpy.array([(rule.config>>6) & 1 for rule in rules], dtype=bool)
+        self.runLength = numpy.zeros(len(rules), dtype=numpy.int64)
+        self.active = numpy.zeros(len(rules), dtype=bool)
+        self.lastBits = numpy.zeros(len(rules), dtype=numpy.int64)
+
+        rules = self.clickRules
+        self.clickThresholds = numpy.array([rule.threshold for rule in rules], dtype=numpy.float64)
+        # axes used by each click rule (single or double), shape (3, rules)
+        self.clickAxes = numpy.array([[(rule.config>>(2*axis)) & 0b11 != 0 for rule in rules]
+                                      for axis in range(3)], dtype=bool).reshape(3, len(rules))
+        self.clickAbove = numpy.zeros(len(rules), dtype=bool)
+        # per click rule; sample the threshold was crossed, its CLICK_SRC
+        # axis/sign bits, end of the last click and the double click state
+        self.clickStates = [{'rise': None, 'axis': 0, 'lastClick': None}
+                            for rule in rules]
+
+        return
+
+    def event_time(self, i, timestamps):
+        """event_time, function to return the time (ns) of sample i of the
+        block, None if unknown"""
+
+        if timestamps is not None:
+            return int(timestamps[i])
+
+        if self.startTime is not None:
+            return self.startTime + int(round((self.sampleCount + i)*1e9/self.rate))
+
+        return None
+
+    def process(self, block, timestamps=None):
+        """process, function to evaluate every rule over a block of samples
+        ((n, 3) array, or flat x, y, z values) and return the events, in
+        sample order. timestamps are the sample times (ns), i.e. from
+        read_fifo(timestamps=True)"""
+
+        data = numpy.asarray(block, dtype=numpy.float64).reshape(-1, 3)*self.factor
+        events = []
+
+        if len(data) > 0:
+            if len(self.interruptRules) > 0:
+                events.extend(self.process_interrupts(data, timestamps))
+            if len(self.clickRules) > 0:
+                events.extend(self.process_clicks(data, timestamps))
+            events.sort(key=lambda event: event['sample'])
+
+        self.sampleCount += len(data)
+
+        return events
+
+    def events(self, blocks):
+        """events, generator of the events of an iterable of blocks, i.e.
+        accel.stream(units='mg') or a LIS3DHDsp pipeline"""
+
+        for block in blocks:
+            for event in self.process(block):
+                yield event
+
+        return
+
+    def process_interrupts(self, data, timestamps):
+        """process_interrupts, function to run the interrupt rules over a
+        block of mg values"""
+
+        n = len(data)
+        thresholds = self.thresholds[None, None, :]
+        values = data[:, :, None]
+
+        magnitude = numpy.abs(values)
+        absoluteBits = axis_bits(magnitude > thresholds, magnitude <= thresholds)
+        directionBits = axis_bits(values > thresholds, values < -thresholds)
+
+        bits = numpy.where(self.d6, directionBits, absoluteBits) & self.enabled
+
+        condition = numpy.where(self.aoi, bits == self.enabled, bits != 0)
+        # 6D position, an enabled direction is held
+        condition = numpy.where(self.aoi & self.d6, bits != 0, condition)
+        # 6D movement, the direction changes to an enabled one
+        previousBits = numpy.concatenate((self.lastBits[None, :], bits[:-1]))
+        condition = numpy.where(~self.aoi & self.d6, (bits != previousBits) & (bits != 0),
+                                condition)
+
+        # samples the condition has held, carried on from the last block
+        index = numpy.arange(n)[:, None]
+        lastFalse = numpy.maximum.accumulate(numpy.where(condition, -1, index), axis=0)
+        runLength = numpy.where(lastFalse < 0, self.runLength + index + 1, index - lastFalse)
+
+        active = runLength > self.durations
+        previousActive = numpy.concatenate((self.active[None, :], active[:-1]))
+        starts = numpy.nonzero(active & ~previousActive)
+
+        self.runLength = runLength[-1]
+        self.active = active[-1]
+        self.lastBits = bits[-1]
+
+        events = []
+
+        for i, r in zip(starts[0], starts[1]):
+            events.append({'rule': self.interruptRules[r].name,
+                           'sample': self.sampleCount + int(i),
+                           'time': self.event_time(i, timestamps),
+                           'source': 0b01000000 | int(bits[i, r])})  # IA bit
+
+        return events
+
+    def process_clicks(self, data, timestamps):
+        """process_clicks, function to run the click rules over a block of
+        mg values. The threshold crossings are found for every rule at
+        once, only the crossings are then timed one by one"""
+
+        magnitude = numpy.abs(data)[:, :, None]
+        above = numpy.any((magnitude > self.clickThresholds) & self.clickAxes[None], axis=1)
+        previous = numpy.concatenate((self.clickAbove[None, :], above[:-1]))
+        edges = numpy.nonzero(above != previous)
+        self.clickAbove = above[-1]
+
+        events = []
+
+        for i, r in zip(edges[0], edges[1]):
+            rule = self.clickRules[r]
+            state = self.clickStates[r]
+            sample = self.sampleCount + int(i)
+
+            if above[i, r]:
+                # crossed the threshold, note the axis and sign of the click
+                axisValues = numpy.where(self.clickAxes[:, r], numpy.abs(data[i]), -1.0)
+                axis = int(numpy.argmax(axisValues))
+                sign = 0b1000 if data[i, axis] < 0 else 0
+                state['rise'] = sample
+                state['axis'] = sign | (1<<axis)
+                continue
+
+            if state['rise'] is None:
+                continue
+
+            rise = state['rise']
+            state['rise'] = None
+
+            if sample - rise > self.samples(rule.timeLimit, 127):
+                continue  # too long to be a click
+
+            axisIndex = (state['axis'] & 0b111).bit_length() - 1
+
+            if rule.config & (0b01<<(2*axisIndex)):  # single click enabled
+                events.append({'rule': rule.name, 'sample': sample,
+                               'time': self.event_time(i, timestamps),
+                               'source': 0b01010000 | state['axis']})  # IA, SClick
+
+            lastClick = state['lastClick']
+            state['lastClick'] = sample
+
+            if lastClick is None or not rule.config & (0b10<<(2*axisIndex)):
+                continue
+
+            # a second click starting in the window after the latency
+            latency = self.samples(rule.timeLatency, 255)
+            window = self.samples(rule.timeWindow, 255)
+
+            if lastClick + latency <= rise <= lastClick + latency + window:
+                events.append({'rule': rule.name, 'sample': sample,
+                               'time': self.event_time(i, timestamps),
+                               'source': 0b01100000 | state['axis']})  # IA, DClick
+                state['lastClick'] = None
+
+        return events
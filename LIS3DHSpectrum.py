@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+"""LIS3DHSpectrum, incremental spectral analysis (Welch averaged power
+spectral density, band energies and peak frequencies) of LIS3DH sample
+streams for vibration monitoring
+
+created Oct 18, 2026"""
+
+"""
+Copyright 2020 Owain Martin
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+""" Usage:
+
+    import json, LIS3DH
+    from LIS3DHSpectrum import spectrum
+
+    accel = LIS3DH.Accelerometer('spi', spiPort = 0, spiCS = 1)
+    accel.set_ODR(odr=1250)
+    accel.set_watermark_mode(25)
+
+    bands = [(0, 10), (10, 100), (100, 300), (300, 625)]
+    for summary in accel.stream(64, units='g') | spectrum(1024, bands=bands,
+                                                            every=16, workers=1):
+        uplink.send(json.dumps(summary))
+
+or on its own,
+
+    engine = SpectrumEngine(1024, bands=bands, rate=accel.odr)
+    engine.feed(block)                    # as often as blocks arrive
+    freqs, psd = engine.psd()             # g^2/Hz, one column per axis
+    engine.summary()
+
+The stream is cut into segments of segment samples overlapping by overlap
+(a fraction), each segment has its mean removed, is windowed and goes
+through numpy.fft.rfft per axis, and the one sided power spectral
+densities are averaged (Welch's method, the same as scipy.signal.welch
+with detrend='constant'). averages=None averages every segment since the
+last reset or summary, averages=n keeps an exponential average over
+roughly the last n segments.
+
+The sample rate is taken from the stream (SampleStream.rate is the ODR set
+with set_ODR, the LIS3DHDsp stages pass on their output rate) or rate=...
+With workers the segment FFTs run in a process pool, feed only hands the
+segments over and the results are merged in the next time the spectrum is
+used, so acquisition isn't held up by the FFTs.
+
+A summary is a json serialisable dict; time (time.time), rate, segments
+(averaged), resolution (Hz per bin), rms (per axis), peakFrequency and
+peakDensity (per axis, DC excluded) and bands, [{low, high, rms}, ...],
+the rms of each axis over each band. Python 3 and numpy are required."""
+
+import time
+
+import numpy
+
+import LIS3DHDsp
+
+def window_function(name, length):
+    """window_function, function to return a periodic window (hann,
+    hamming or rectangular) of length samples, as used for spectral
+    analysis"""
+
+    if name == 'rectangular':
+        return numpy.ones(length)
+
+    n = numpy.arange(length)
+
+    if name == 'hamming':
+        return 0.54 - 0.46*numpy.cos(2*numpy.pi*n/length)
+
+    return 0.5 - 0.5*numpy.cos(2*numpy.pi*n/length)  # hann
+
+def segment_psd(segments, window, rate):
+    """segment_psd, function to return the sum of the one sided power
+    spectral densities ((bins, axes) array) of a (segments, samples, axes)
+    array of segments. Module level so it can run in a process pool"""
+
+    data = segments - segments.mean(axis=1, keepdims=True)
+    spectrum = numpy.fft.rfft(data*window[None, :, None], axis=1)
+
+    power = (spectrum.real**2 + spectrum.imag**2).sum(axis=0)
+    power /= rate*(window**2).sum()
+
+    # fold the negative frequencies in, not for DC or the Nyquist bin
+    if len(window) % 2 == 0:
+        power[1:-1] *= 2
+    else:
+        power[1:] *= 2
+
+    return power
+
+def psd_band_rms(freqs, density, low, high):
+    """psd_band_rms, function to return the rms of each axis of a psd
+    ((bins, axes) array) over the band low <= f < high (Hz), the square
+    root of the integrated psd"""
+
+    inBand = (freqs >= low) & (freqs < high)
+    energy = density[inBand].sum(axis=0)*(freqs[1] - freqs[0])
+
+    return numpy.sqrt(energy)
+
+def psd_peak(freqs, density):
+    """psd_peak, function to return the (frequencies (Hz), densities) of
+    the largest bin of each axis of a psd, DC excluded. The frequency is
+    refined between bins by fitting a parabola to the peak and its
+    neighbours"""
+
+    resolution = freqs[1] - freqs[0]
+    peakFreqs = []
+    peakDensities = []
+
+    for axis in range(density.shape[1]):
+        values = density[:, axis]
+        i = int(numpy.argmax(values[1:])) + 1
+        offset = 0.0
+        if i < len(values) - 1:
+            left, centre, right = values[i-1], values[i], values[i+1]
+            curve = left - 2*centre + right
+            if curve < 0:
+                offset = 0.5*(left - right)/curve
+        peakFreqs.append((i + offset)*resolution)
+        peakDensities.append(values[i])
+
+    return peakFreqs, peakDensities
+
+class SpectrumEngine(LIS3DHDsp.Stage):
+    """SpectrumEngine, incremental Welch power spectral density of a
+    stream of sample blocks ((n, axes) arrays).
+
+    segment - samples per FFT segment, the resolution is rate/segment
+    overlap - overlap of consecutive segments, a fraction of segment
+    window - hann, hamming or rectangular
+    bands - (low, high) frequency bands (Hz) for the summaries
+    averages - None for the average of every segment since the last reset,
+               or n for an exponential average over about n segments
+    every - segments per summary when used as a pipeline stage; with
+            averages=None each summary covers only its own segments
+    workers - processes for the FFTs, 0 to run them in feed
+    executor - an existing concurrent.futures executor to use instead"""
+
+    def __init__(self, segment=256, overlap=0.5, window='hann', bands=None,
+                 averages=None, every=8, workers=0, executor=None, rate=None):
+
+        self.segment = segment
+        self.hop = max(1, segment - int(segment*overlap))
+        self.windowName = window
+        self.bands = list(bands or [])
+        self.averages = averages
+        self.every = every
+        self.workers = workers
+        self.executor = executor
+        self.ownExecutor = False
+        self.futures = []
+        self.sampleRate = None  # rate of the current stream, self.rate is as given
+
+        LIS3DHDsp.Stage.__init__(self, rate)
+
+        if rate is None:
+            self.reset(None)
+
+    def reset(self, rate=None):
+        """reset, function to clear the samples, futures and averages for a
+        new stream at rate (Hz)"""
+
+        self.sampleRate = rate
+        self.window = window_function(self.windowName, self.segment)
+        self.tail = None         # samples not yet in a whole segment
+        self.futures = []        # (future, segment count) of pool batches
+        self.clear()
+
+        return
+
+    def clear(self):
+        """clear, function to restart the average, keeping the samples of
+        the next segment"""
+
+        self.average = None      # averaged psd, (bins, axes)
+        self.segments = 0        # segments in the average
+        self.fresh = 0           # segments merged since the last summary
+
+        return
+
+    def frequencies(self):
+        """frequencies, function to return the frequency (Hz) of each bin"""
+
+        return numpy.fft.rfftfreq(self.segment, 1.0/self.sampleRate)
+
+    def pool(self):
+        """pool, function to return the executor running the FFTs, starting
+        a process pool on first use, None if the FFTs run in feed"""
+
+        if self.executor is None and self.workers > 0:
+            from concurrent.futures import ProcessPoolExecutor
+
+            self.executor = ProcessPoolExecutor(self.workers)
+            self.ownExecutor = True
+
+        return self.executor
+
+    def feed(self, block):
+        """feed, function to add a block of samples and start the FFTs of
+        any segments it completes. Returns the number of new segments"""
+
+        block = LIS3DHDsp.as_block(block)
+
+        if self.sampleRate is None:
+            raise ValueError('sample rate not known, give rate=...')
+
+        if self.tail is not None and len(self.tail) > 0:
+            block = numpy.concatenate((self.tail, block))
+
+        count = 0
+        if len(block) >= self.segment:
+            count = (len(block) - self.segment)//self.hop + 1
+
+        if count > 0:
+            # (segments, samples, axes) copies of the overlapping segments
+            index = numpy.arange(count)[:, None]*self.hop + numpy.arange(self.segment)[None, :]
+            segments = block[index]
+
+            executor = self.pool()
+
+            if executor is None:
+                self.merge(segment_psd(segments, self.window, self.sampleRate), count)
+            else:
+                future = executor.submit(segment_psd, segments, self.window, self.sampleRate)
+                self.futures.append((future, count))
+
+        self.tail = block[count*self.hop:].copy()
+
+        return count
+
+    def merge(self, power, count):
+        """merge, function to add the summed psd of count segments to the
+        average"""
+
+        if self.average is None:
+            self.average = power/count
+        elif self.averages is None:
+            self.average = (self.average*self.segments + power)/(self.segments + count)
+        else:
+            keep = (1.0 - 1.0/self.averages)**count
+            self.average = self.average*keep + (power/count)*(1.0 - keep)
+
+        self.segments += count
+        self.fresh += count
+
+        return
+
+    def collect(self, wait=False):
+        """collect, function to merge the finished pool FFTs into the
+        average, in the order they were fed. With wait it blocks until all
+        of them are done. Returns the number of segments merged"""
+
+        merged = 0
+
+        while len(self.futures) > 0:
+            future, count = self.futures[0]
+            if not wait and not future.done():
+                break
+            self.futures.pop(0)
+            self.merge(future.result(), count)
+            merged += count
+
+        return merged
+
+    def psd(self, wait=True):
+        """psd, function to return (frequencies (Hz), power spectral density
+        ((bins, axes) array, units^2/Hz)) of the averaged segments, None
+        for the density if no segment has been averaged"""
+
+        self.collect(wait)
+
+        return self.frequencies(), self.average
+
+    def band_rms(self, low, high, wait=True):
+        """band_rms, function to return the rms of each axis over the band
+        low <= f < high (Hz), the square root of the integrated psd"""
+
+        freqs, density = self.psd(wait)
+
+        if density is None:
+            return None
+
+        return psd_band_rms(freqs, density, low, high)
+
+    def peak(self, wait=True):
+        """peak, function to return the (frequencies (Hz), densities) of the
+        largest psd bin of each axis, DC excluded, see psd_peak"""
+
+        freqs, density = self.psd(wait)
+
+        if density is None:
+            return None, None
+
+        return psd_peak(freqs, density)
+
+    def summary(self, wait=True):
+        """summary, function to return a json serialisable dict of the
+        spectrum; rms, peak frequency and density and the band rms values
+        per axis, see the module notes. Every field comes from the one
+        average, collected once"""
+
+        freqs, density = self.psd(wait)
+
+        result = {'time': time.time(), 'rate': self.sampleRate, 'segments': self.segments,
+                  'resolution': float(self.sampleRate)/self.segment}
+
+        if density is None:
+            return result
+
+        peakFreqs, peakDensities = psd_peak(freqs, density)
+
+        result['rms'] = numpy.sqrt(density.sum(axis=0)*result['resolution']).tolist()
+        result['peakFrequency'] = [float(value) for value in peakFreqs]
+        result['peakDensity'] = [float(value) for value in peakDensities]
+        result['bands'] = [{'low': low, 'high': high,
+                            'rms': psd_band_rms(freqs, density, low, high).tolist()}
+                           for low, high in self.bands]
+
+        return result
+
+    def run(self, blocks):
+        """run, generator of a summary every every segments of the blocks.
+        Pool FFTs still running are left for a later summary, so the next
+        blocks keep being fed"""
+
+        for block in blocks:
+            self.feed(block)
+            self.collect()
+
+            if self.fresh >= self.every:
+                yield self.summary(False)
+                if self.averages is None:
+                    self.clear()
+                else:
+                    self.fresh = 0
+
+        self.collect(True)
+
+        if self.fresh > 0:
+            yield self.summary()
+
+        return
+
+    def output_rate(self, rate):
+        """output_rate, function to return the rate of the summaries (Hz)"""
+
+        if rate is None:
+            return None
+
+        return float(rate)/(self.hop*self.every)
+
+    def close(self):
+        """close, function to shut down a process pool started by the
+        engine"""
+
+        if self.ownExecutor and self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+            self.ownExecutor = False
+
+        return
+
+def spectrum(segment=256, overlap=0.5, window='hann', bands=None, averages=None,
+             every=8, workers=0, rate=None):
+    """spectrum, function to return a SpectrumEngine stage yielding a
+    summary every every segments"""
+
+    return SpectrumEngine(segment, overlap, window, bands, averages, every,
+                          workers, None, rate)
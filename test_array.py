@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""test_array, checks of SensorArray against the emulator, run with
+python -m pytest
+
+created Oct 18, 2026"""
+
+import LIS3DH, LIS3DHArray, LIS3DHEmulator
+
+def test_read_of_an_empty_array():
+
+    sensors = LIS3DHArray.SensorArray(period=0.01)
+
+    assert sensors.read(0.1) == (None, {})
+
+    sensors.start()
+    try:
+        roundTime, blocks = sensors.read(0.1)
+        assert blocks == {}
+        assert sensors.busCount == 0
+    finally:
+        sensors.stop()
+
+def test_read_hands_back_every_device():
+
+    sensors = LIS3DHArray.SensorArray(period=0.01, method='poll')
+
+    for name in ('front', 'back'):
+        device = LIS3DHEmulator.EmulatedLIS3DH(source=LIS3DHEmulator.SineSignal(5))
+        accel = LIS3DH.Accelerometer(transport=LIS3DHEmulator.EmulatedTransport(device))
+        accel.set_ODR(odr=400)
+        sensors.add(name, accel, bus=name)
+
+    sensors.start()
+    try:
+        roundTime, blocks = sensors.read(1.0)
+        assert sorted(blocks) == ['back', 'front']
+        assert all(len(block) == 3 for block in blocks.values())
+    finally:
+        sensors.stop()
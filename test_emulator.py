@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""test_emulator, checks of the LIS3DH emulator, run with python -m pytest
+
+created Oct 18, 2026"""
+
+import LIS3DH, LIS3DHEmulator
+
+class FakeClock:
+    """FakeClock, emulator clock (s) that only moves when it is set"""
+
+    def __init__(self):
+
+        self.now = 10.0
+
+    def __call__(self):
+
+        return self.now
+
+def test_samples_are_timed_from_the_odr_write():
+
+    clock = FakeClock()
+    device = LIS3DHEmulator.EmulatedLIS3DH(source=LIS3DHEmulator.SineSignal(5), clock=clock)
+    accel = LIS3DH.Accelerometer(transport=LIS3DHEmulator.EmulatedTransport(device))
+    accel.set_fifo_mode('stream')
+    accel.set_ODR(odr=100)
+
+    # no bus transaction since the write, 10.5 sample periods later
+    clock.now += 0.105
+
+    assert LIS3DH.fifo_count(accel.single_access_read(0x2F)) == 10
+
+def test_default_i2c_address():
+
+    device = LIS3DHEmulator.EmulatedLIS3DH()
+    accel = LIS3DH.Accelerometer('i2c', device=LIS3DHEmulator.EmulatedSMBus(device))
+
+    assert accel.single_access_read(0x0F) == 0x33  # WHO_AM_I
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""test_profile, checks of apply, snapshot and resync against the emulator,
+run with python -m pytest
+
+created Oct 18, 2026"""
+
+import LIS3DH, LIS3DHEmulator
+
+def emulated_accelerometer(shadow=False):
+
+    device = LIS3DHEmulator.EmulatedLIS3DH(source=LIS3DHEmulator.SineSignal(5))
+    transport = LIS3DHEmulator.EmulatedTransport(device)
+    accel = LIS3DH.Accelerometer(transport=transport, shadow=shadow)
+
+    return accel, transport
+
+def test_apply_registers_restarts_the_sample_clock():
+
+    accel, transport = emulated_accelerometer()
+    accel.set_ODR(odr=100)
+    profile = accel.snapshot()
+
+    accel.set_ODR(odr=400)
+    accel.sampleClock.add(10, 1000000000)
+    accel.sampleClock.add(10, 1025000000)
+
+    accel.apply(profile)
+
+    assert accel.odr == 100
+    assert accel.sampleClock.odr == 100
+    assert accel.sampleClock.sampleCount == 0
+
+def test_resync_follows_an_odr_change_made_elsewhere():
+
+    accel, transport = emulated_accelerometer(shadow=True)
+    accel.set_ODR(odr=100)
+
+    transport.write_byte(0x20, 0b10011111)  # 5000Hz low power, xyz on
+    accel.resync()
+
+    assert (accel.odr, accel.powerMode) == (5000, 'low')
+    assert accel.sampleClock.odr == 5000
+    assert accel.dataShift == 8
+
+class RecordingTransport(LIS3DHEmulator.EmulatedTransport):
+    """RecordingTransport, EmulatedTransport that keeps every register
+    read by a transaction"""
+
+    def __init__(self, device, mode='spi'):
+
+        LIS3DHEmulator.EmulatedTransport.__init__(self, device, mode)
+        self.readRegisters = set()
+
+    def read_byte(self, reg):
+
+        self.readRegisters.add(reg)
+
+        return LIS3DHEmulator.EmulatedTransport.read_byte(self, reg)
+
+    def read(self, reg, count=1):
+
+        self.readRegisters.update(range(reg, reg+count))
+
+        return LIS3DHEmulator.EmulatedTransport.read(self, reg, count)
+
+def test_reference_is_only_read_in_reference_mode():
+
+    device = LIS3DHEmulator.EmulatedLIS3DH(source=LIS3DHEmulator.SineSignal(5))
+    transport = RecordingTransport(device)
+    accel = LIS3DH.Accelerometer(transport=transport)
+
+    # normal mode, reading REFERENCE would reset the filter
+    accel.set_highpass_filter('normalreset', 0, 0, 0, 0, 1)
+    transport.readRegisters.clear()
+    accel.resync()
+    profile = accel.snapshot()
+    accel.apply(LIS3DH.Profile(set_scale=4))
+
+    assert 0x26 not in transport.readRegisters
+    assert 0x26 not in profile.registers
+
+    # reference mode, REFERENCE is part of the state to restore
+    accel.set_highpass_filter('reference', 0, 0, 0, 0, 1)
+    accel.shadow_write(0x26, 0x40)
+    profile = accel.snapshot()
+    assert profile.registers[0x26] == 0x40
+
+    accel.shadow_write(0x26, 0x00)
+    accel.apply(profile)
+    assert transport.read_byte(0x26) == 0x40
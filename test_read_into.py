@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""test_read_into, checks that read_xyz_into and read_fifo_into allocate
+nothing per sample once warmed up, run with python -m pytest
+
+created Oct 18, 2026"""
+
+import gc, tracemalloc
+
+import numpy
+import pytest
+
+import LIS3DH
+
+class FakeTransport:
+    """FakeTransport, register image transport whose read_into copies from
+    views made once per (register, length), so it allocates nothing
+    itself once warmed up"""
+
+    mode = 'spi'
+    busKey = ('fake', 0)
+    maxBlock = 4095
+
+    def __init__(self):
+
+        self.registers = bytearray(256)
+        self.views = [[None]*(257-reg) for reg in range(256)]
+
+        # the same sample in every fifo level; x 1000, y -1000, z 16000.
+        # Burst reads from OUT_X_L wrap round the output registers
+        sample = numpy.array([1000, -1000, 16000], dtype='<i2').tobytes()
+        self.registers[0x28:0x2E] = sample
+        self.fifo = bytearray(sample*32)
+
+    def read_into(self, reg, buf):
+
+        view = self.views[reg][len(buf)]
+        if view is None:
+            if reg == 0x28:
+                view = memoryview(self.fifo)[:len(buf)]
+            else:
+                view = memoryview(self.registers)[reg:reg+len(buf)]
+            self.views[reg][len(buf)] = view
+        buf[:] = view
+
+        return
+
+    def read(self, reg, count=1):
+
+        return list(self.registers[reg:reg+count])
+
+    def read_byte(self, reg):
+
+        return self.registers[reg]
+
+    def write(self, reg, values):
+
+        self.registers[reg:reg+len(values)] = bytes(values)
+
+        return
+
+    def write_byte(self, reg, value):
+
+        self.registers[reg] = value
+
+        return
+
+    def close(self):
+
+        return
+
+def allocations(read, reads=1000, warmUp=300):
+    """allocations, function to return (bytes still held by LIS3DH.py
+    allocations, peak traced bytes) over reads calls of read, after
+    warmUp calls. Tracing starts before the warm up so the bounded
+    SampleClock history (one entry per read, replaced as new reads come
+    in) is all traced by the time it is measured, leaving only a little
+    noise from the float and int free lists"""
+
+    tracemalloc.start()
+
+    try:
+        for i in range(warmUp):
+            read()
+        gc.collect()
+
+        before = tracemalloc.take_snapshot()
+        current = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+
+        for i in range(reads):
+            read()
+
+        peak = tracemalloc.get_traced_memory()[1] - current
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+
+    moduleOnly = [tracemalloc.Filter(True, LIS3DH.__file__)]
+    held = sum(stat.size_diff for stat in
+               after.filter_traces(moduleOnly).compare_to(before.filter_traces(moduleOnly), 'filename'))
+
+    return held, peak
+
+def accelerometer(fifoSamples=8):
+
+    transport = FakeTransport()
+    transport.registers[0x2F] = fifoSamples  # FIFO_SRC_REG FSS bits
+    accel = LIS3DH.Accelerometer(transport=transport)
+
+    return accel, transport
+
+def test_read_xyz_into_allocates_nothing():
+
+    accel, transport = accelerometer()
+    raw = numpy.zeros(3, dtype=numpy.int16)
+    converted = numpy.zeros(3)
+
+    for out, units in [(raw, None), (converted, 'g')]:
+        for reads in (1000, 5000):
+            held, peak = allocations(lambda: accel.read_xyz_into(out, units), reads)
+            assert held < 256
+            assert peak < 512  # the measuring loop itself, not the reads
+
+    assert list(raw) == [1000>>6, -1000>>6, 16000>>6]
+    assert numpy.allclose(converted, numpy.array([1000>>6, -1000>>6, 16000>>6])*accel.unit_factor('g'))
+
+def test_read_fifo_into_allocates_nothing_per_sample():
+
+    for dtype, units in [(numpy.int16, None), (numpy.float64, 'g')]:
+        peaks = []
+
+        for fifoSamples in (4, 31):
+            accel, transport = accelerometer(fifoSamples)
+            out = numpy.zeros((32, 3), dtype=dtype)
+
+            # nothing kept per read, 1000 or 5000 reads of up to 31 samples
+            for reads in (1000, 5000):
+                held, peak = allocations(lambda: accel.read_fifo_into(out, units), reads)
+                assert held < 256
+            assert accel.read_fifo_into(out, units) == fifoSamples
+            peaks.append(peak)
+
+        # the small per read allocations (the drain time and the
+        # SampleClock entry) are the same for 4 and 31 samples
+        assert peaks[0] == peaks[1]
+
+        expected = numpy.array([1000>>6, -1000>>6, 16000>>6])
+        if units is not None:
+            expected = expected*accel.unit_factor(units)
+        assert numpy.allclose(out[:31], expected)
+
+def test_into_rejects_out_arrays_it_cannot_fill():
+
+    accel, transport = accelerometer()
+
+    # an integer out would truncate the unit factor to 0
+    with pytest.raises(ValueError):
+        accel.read_xyz_into(numpy.zeros(3, dtype=numpy.int16), 'g')
+    with pytest.raises(ValueError):
+        accel.read_fifo_into(numpy.zeros((32, 3), dtype=numpy.int32), 'g')
+
+    # a non contiguous out would be decoded into a temporary copy
+    with pytest.raises(ValueError):
+        accel.read_xyz_into(numpy.zeros(6)[::2], 'g')
+    with pytest.raises(ValueError):
+        accel.read_fifo_into(numpy.zeros((32, 6))[:, :3], 'g')
+
+    # a (2, 3) out gets x, y, z in its first row
+    out = numpy.zeros((2, 3))
+    accel.read_xyz_into(out, 'g')
+    assert numpy.allclose(out[0], numpy.array([1000>>6, -1000>>6, 16000>>6])*accel.unit_factor('g'))
+    assert list(out[1]) == [0, 0, 0]
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""test_stream, checks of the start_stream acquisition thread against the
+emulator, run with python -m pytest
+
+created Oct 18, 2026"""
+
+import errno, threading, time
+
+import pytest
+
+import LIS3DH, LIS3DHEmulator, LIS3DHGpio
+
+class FailingTransport(LIS3DHEmulator.EmulatedTransport):
+    """FailingTransport, EmulatedTransport whose reads fail with a bus
+    error (EREMOTEIO, as i2c-dev gives for a missing ack) once failing is
+    set"""
+
+    failing = False
+
+    def read_byte(self, reg):
+
+        if self.failing:
+            raise OSError(errno.EREMOTEIO, 'Remote I/O error')
+
+        return LIS3DHEmulator.EmulatedTransport.read_byte(self, reg)
+
+    def read(self, reg, count=1):
+
+        if self.failing:
+            raise OSError(errno.EREMOTEIO, 'Remote I/O error')
+
+        return LIS3DHEmulator.EmulatedTransport.read(self, reg, count)
+
+    def read_into(self, reg, buf):
+
+        if self.failing:
+            raise OSError(errno.EREMOTEIO, 'Remote I/O error')
+
+        return LIS3DHEmulator.EmulatedTransport.read_into(self, reg, buf)
+
+def failing_accelerometer():
+
+    device = LIS3DHEmulator.EmulatedLIS3DH(source=LIS3DHEmulator.SineSignal(5))
+    transport = FailingTransport(device)
+    accel = LIS3DH.Accelerometer(transport=transport)
+    accel.set_ODR(odr=100)
+
+    return accel, transport
+
+def run_consumer(consume):
+    """run_consumer, function to run consume on a thread and return what
+    it returned or raised, failing if it is still blocked after 2s"""
+
+    result = {}
+
+    def consumer():
+        try:
+            result['value'] = consume()
+        except Exception as e:
+            result['error'] = e
+
+    thread = threading.Thread(target=consumer)
+    thread.daemon = True
+    thread.start()
+    thread.join(2.0)
+
+    assert not thread.is_alive(), 'consumer still blocked after the stream failed'
+
+    return result
+
+@pytest.mark.parametrize('source', ['poll', 'fifo'])
+def test_wait_raises_when_the_stream_fails(source):
+
+    accel, transport = failing_accelerometer()
+    if source == 'fifo':
+        accel.set_fifo_mode('stream')
+
+    accel.start_stream(source)
+    transport.failing = True
+
+    # more samples than will ever come, with no timeout
+    result = run_consumer(lambda: accel.wait(1000))
+
+    assert isinstance(result.get('error'), OSError)
+    assert result['error'].errno == errno.EREMOTEIO
+    assert accel.streamError is result['error']
+
+    with pytest.raises(OSError):
+        accel.read_available()
+
+    transport.failing = False  # so the accelerometer can power down
+
+def test_sample_stream_raises_when_the_stream_fails():
+
+    accel, transport = failing_accelerometer()
+
+    def consume():
+        blocks = 0
+        for block in accel.stream(8):
+            blocks += 1
+            transport.failing = True
+        return blocks
+
+    result = run_consumer(consume)
+
+    assert isinstance(result.get('error'), OSError)
+
+    transport.failing = False
+
+def test_wait_returns_when_the_stream_is_stopped():
+
+    accel, transport = failing_accelerometer()
+    accel.start_stream('poll')
+
+    stopper = threading.Timer(0.2, accel.stop_stream)
+    stopper.start()
+
+    result = run_consumer(lambda: accel.wait(1000))
+
+    assert result == {'value': None}
+
+class FakeTime:
+    """FakeTime, stand in for the time module in LIS3DH, a clock that only
+    moves when FakeStop.wait sleeps"""
+
+    def __init__(self):
+
+        self.now = 100.0
+
+    def monotonic(self):
+
+        return self.now
+
+    def monotonic_ns(self):
+
+        return int(self.now*1e9)
+
+    def time(self):
+
+        return self.now
+
+    def perf_counter(self):
+
+        return self.now
+
+class FakeStop:
+    """FakeStop, stand in for streamStop whose wait moves the fake clock on
+    by the sleep plus a jitter; usually 0.2ms, 3.2ms one sleep in ten (a
+    busy system). It is set after count sleeps"""
+
+    def __init__(self, clock, count):
+
+        self.clock = clock
+        self.count = count
+        self.sleeps = 0
+
+    def is_set(self):
+
+        return self.sleeps >= self.count
+
+    def wait(self, timeout=None):
+
+        jitter = 0.0032 if self.sleeps % 10 == 9 else 0.0002
+        self.clock.now += timeout + jitter
+        self.sleeps += 1
+
+        return False
+
+@pytest.mark.parametrize('odr, powerMode', [(1600, 'normal'), (5000, 'low')])
+def test_polled_fifo_does_not_overrun(monkeypatch, odr, powerMode):
+
+    clock = FakeTime()
+    monkeypatch.setattr(LIS3DH, 'time', clock)
+
+    device = LIS3DHEmulator.EmulatedLIS3DH(source=LIS3DHEmulator.SineSignal(5),
+                                           clock=clock.monotonic)
+    accel = LIS3DH.Accelerometer(transport=LIS3DHEmulator.EmulatedTransport(device))
+    accel.set_ODR(odr=odr, powerMode=powerMode)
+    accel.set_watermark_mode(25)
+
+    # run the acquisition loop itself, without a thread, for 2000 drains
+    accel.streamBuffer = LIS3DH.SampleBuffer(65536)
+    accel.streamStop = FakeStop(clock, 2000)
+    accel.stream_loop('fifo', None)
+
+    assert accel.streamError is None
+    assert accel.dataLoss['fifoOverruns'] == 0
+    assert accel.streamBuffer.head > 2000*10
+
+def test_drdy_edges_time_the_samples():
+
+    device = LIS3DHEmulator.EmulatedLIS3DH(source=LIS3DHEmulator.SineSignal(5))
+    accel = LIS3DH.Accelerometer(transport=LIS3DHEmulator.EmulatedTransport(device))
+    accel.set_ODR(odr=100)
+    accel.set_int1_pin(drdy1=1)
+
+    edges = LIS3DHGpio.PipeEdgeSource()
+    accel.start_stream(edgeSource=edges)
+
+    # kernel timestamps well away from the host read times
+    start = time.monotonic_ns() - 10**9
+    try:
+        for i in range(20):
+            edges.trigger(start + i*10**7)
+            time.sleep(0.005)
+        accel.wait(20, 2.0)
+    finally:
+        accel.stop_stream()
+        edges.close()
+
+    # samples the emulator makes between the fake edges are read (as a
+    # missed edge) at the host time, a second after the edge times
+    edgeTimes = set(start + i*10**7 for i in range(20))
+    times = [accel.sampleClock.origin + int(t) for count, t in accel.sampleClock.reads]
+
+    assert accel.streamEdgeTime == start + 19*10**7
+    assert start + 19*10**7 in times
+    assert all(t in edgeTimes or t > start + 5*10**8 for t in times)
+
+def test_watermark_edge_times_the_fifo_read():
+
+    device = LIS3DHEmulator.EmulatedLIS3DH(source=LIS3DHEmulator.SineSignal(5))
+    accel = LIS3DH.Accelerometer(transport=LIS3DHEmulator.EmulatedTransport(device))
+    accel.set_ODR(odr=1600)
+
+    accel.count_fifo_read(25, 1000000000, 25)
+    # the 25th of 27 samples read arrived with the edge
+    accel.count_fifo_read(27, 1016000000, 27, (1015000000, 25))
+    # a stale edge, from before the last read, is not used
+    accel.count_fifo_read(26, 1032000000, 26, (1015000000, 25))
+
+    assert accel.sampleClock.reads == [(25, 0.0), (50, 15000000.0), (78, 32000000.0)]